@@ -1,31 +1,39 @@
-from flask import Flask, jsonify, render_template, request, redirect, url_for, session
+from flask import Blueprint, Flask, Response, current_app, jsonify, render_template, request, redirect, url_for, session, send_from_directory, stream_with_context
 from flask_cors import CORS
+import click
 import mysql.connector
 from contextlib import contextmanager
 import os
 from dotenv import load_dotenv
 import logging
-from logging.handlers import RotatingFileHandler
-import statistics
+import logging_setup
 import file_handler
-import sys
 import json
+import base64
+from datetime import datetime
+import db_pool
+from search_index import SearchIndex
+from topic_index import TopicIndex
+from similarity_index import SimilarityIndex
+from response_cache import ResponseCache
+import topic_stats
+import post_store
+import post_export
+import jobs
+import migrate
+import instrumentation
 
 # Load environment
 load_dotenv()
 
-# Flask app setup
-app = Flask(__name__)
-CORS(app)
+# Routes live on a blueprint so create_app can build the app per process
+bp = Blueprint("main", __name__, cli_group=None)
 
-# For session storage
-app.secret_key = os.getenv("SECRET_KEY")
+INSTANCE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "instance")
 
-# Logging
-logging.basicConfig(level=logging.INFO, handlers=[
-    RotatingFileHandler("app.log", maxBytes=100000, backupCount=3),
-    logging.StreamHandler(sys.stdout)
-])
+# Started by create_app; JSON lines written by a background thread,
+# never on the request path
+log_listener = None
 
 # Database config
 db_config = {
@@ -35,21 +43,65 @@ db_config = {
     "database": os.getenv("DB_NAME"),
 }
 
+# Connection pool shared by every request handler (and job worker) of a process
+db_connection_pool = db_pool.ConnectionPool(
+    db_config,
+    size=int(os.getenv("DB_POOL_SIZE", 10)),
+    timeout=float(os.getenv("DB_POOL_TIMEOUT", 5)),
+    ping_interval=float(os.getenv("DB_POOL_PING_INTERVAL", 0)),
+)
+
+# In-process full-text index behind /api/search-suggestions
+post_search_index = SearchIndex(max_age=float(os.getenv("SEARCH_INDEX_MAX_AGE", 300)))
+SEARCH_SUGGESTION_LIMIT = 10
+
+# In-memory topic list behind /api/topics and topic autocomplete
+topic_index = TopicIndex(max_age=float(os.getenv("TOPIC_INDEX_MAX_AGE", 300)))
+
+# Post/topic incidence behind the similar posts on /post/<id>
+similarity_index = SimilarityIndex(
+    max_age=float(os.getenv("SIMILARITY_INDEX_MAX_AGE", 300)),
+    max_candidates_per_topic=int(os.getenv("SIMILARITY_MAX_CANDIDATES_PER_TOPIC", 500)),
+)
+
+# Rendered read endpoints, invalidated by save_post through version tags
+response_cache = ResponseCache(
+    max_entries=int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", 1024)),
+    ttl=float(os.getenv("RESPONSE_CACHE_TTL", 300)),
+    redis_url=os.getenv("REDIS_URL"),
+)
+
+# Background workers for /add-post and /api/import ingestion jobs
+job_queue = jobs.JobQueue(
+    path=os.getenv("JOBS_DB_PATH", os.path.join(INSTANCE_PATH, "jobs.sqlite3")),
+    upload_dir=os.getenv("JOBS_UPLOAD_DIR", os.path.join(INSTANCE_PATH, "uploads")),
+    workers=int(os.getenv("JOB_WORKERS", 2)),
+    max_attempts=int(os.getenv("JOB_MAX_ATTEMPTS", 3)),
+    backoff=float(os.getenv("JOB_RETRY_BACKOFF", 30)),
+)
+
+# Statements slower than this are logged with their text
+SLOW_QUERY_SECONDS = float(os.getenv("SLOW_QUERY_MS", 500)) / 1000
+
 @contextmanager
 def get_db_connection():
-    conn = None
+    conn = db_connection_pool.acquire()
     try:
-        conn = mysql.connector.connect(**db_config)
-        yield conn
+        yield instrumentation.InstrumentedConnection(conn, SLOW_QUERY_SECONDS)
+    except (mysql.connector.errors.InterfaceError, mysql.connector.errors.OperationalError):
+        # The connection itself is suspect; don't hand it to the next request
+        db_connection_pool.discard(conn)
+        conn = None
+        raise
     finally:
-        if conn and conn.is_connected():
-            conn.close()
+        if conn is not None:
+            db_connection_pool.release(conn)
 
-@app.route("/")
+@bp.route("/")
 def home():
     return render_template("home.html")
 
-@app.route("/add-post", methods=['GET', 'POST'])
+@bp.route("/add-post", methods=['GET', 'POST'])
 def add_post():
     error = None
     if request.method == 'POST':
@@ -57,22 +109,55 @@ def add_post():
         if not files or not files[0].filename:
             error = "No file selected."
         else:
-            result = file_handler.handle_files(files)
-            if isinstance(result, dict): 
-                session['last_upload'] = result 
-                return redirect(url_for('confirm_upload_post'))
-            else:
-                error = result 
+            # Scraping runs on the job workers; the confirm page waits for it
+            job_id = job_queue.enqueue(files, metrics_only=bool(request.form.get('metrics-only')))
+            return redirect(url_for('main.confirm_upload_post', job=job_id))
     return render_template("add_post.html", error=error)
 
-@app.route("/confirm-upload-post")
+def job_response(job):
+    succeeded = sum(1 for result in job["results"] if result and result['ok'])
+    failed = sum(1 for result in job["results"] if result and not result['ok'])
+    return {**job, "succeeded": succeeded, "failed": failed}
+
+@bp.route("/api/import", methods=['POST'])
+def api_import():
+    files = request.files.getlist('file-upload')
+    if not files or not files[0].filename:
+        return jsonify({"error": "No file selected."}), 400
+
+    # Refreshing metrics of known posts needs no scraping at all
+    metrics_only = request.args.get('metrics_only', '').lower() in ('1', 'true', 'yes')
+    job_id = job_queue.enqueue(files, metrics_only=metrics_only)
+    return jsonify({"job_id": job_id, "status_url": url_for('main.api_job', job_id=job_id)}), 202
+
+@bp.route("/api/jobs/<job_id>")
+def api_job(job_id):
+    job = job_queue.get(job_id)
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job_response(job))
+
+@bp.route("/confirm-upload-post")
 def confirm_upload_post():
+    job_id = request.args.get("job")
+    if job_id:
+        job = job_queue.get(job_id)
+        if not job:
+            return redirect(url_for('main.add_post'))
+        if job["status"] != jobs.DONE:
+            return render_template("add_post.html", job=job)
+        result = file_handler.single_post_result(job["results"])
+        if not isinstance(result, dict):
+            return render_template("add_post.html", error=result)
+        session['last_upload'] = result
+
     data = session.get('last_upload')
     if not data:
-        return redirect(url_for('add_post'))
+        return redirect(url_for('main.add_post'))
     return render_template("confirm_upload_post.html", data=data)
 
-@app.route("/posts")
+@bp.route("/posts")
+@response_cache.cached("posts")
 def posts():
     try:
         with get_db_connection() as conn:
@@ -84,68 +169,148 @@ def posts():
                     post['post_datetime'] = post['post_datetime'].strftime('%d %B %Y')
             return render_template("posts.html", posts=initial_posts)
     except mysql.connector.Error as err:
-        app.logger.error(f"Database error: {err}")
+        current_app.logger.error(f"Database error: {err}")
         return "Database error", 500
     
-@app.route("/api/posts")
+# Largest ?limit= /api/posts serves in one page
+MAX_PAGE_SIZE = 100
+
+# Whitelist to prevent injection
+VALID_SORT_COLUMNS = ["post_datetime", "likes", "comments", "impressions"]
+
+# Query parameter -> SQL condition for the /api/posts filters
+POST_FILTERS = [
+    ("date_from", "post_datetime >= %s"),
+    ("date_to", "post_datetime <= %s"),
+    ("likes_min", "likes >= %s"),
+    ("likes_max", "likes <= %s"),
+    ("impressions_min", "impressions >= %s"),
+    ("impressions_max", "impressions <= %s"),
+    ("comments_min", "comments >= %s"),
+    ("comments_max", "comments <= %s"),
+    ("topic_id", "post_id IN (SELECT post_id FROM topic_posts WHERE topic_id = %s)"),
+]
+
+def build_post_filters(args):
+    """Turn the /api/posts filter query parameters into SQL conditions and params."""
+    conditions = []
+    params = []
+    for arg, condition in POST_FILTERS:
+        value = args.get(arg)
+        if value:
+            conditions.append(condition)
+            params.append(value)
+    return conditions, params
+
+def encode_cursor(sort_by, sort_order, row):
+    """Opaque keyset cursor pointing just past `row` in the given sort order."""
+    value = row[sort_by]
+    if isinstance(value, datetime):
+        value = value.strftime("%Y-%m-%d %H:%M:%S")
+    payload = json.dumps([sort_by, sort_order, value, str(row["post_id"])], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor, sort_by, sort_order):
+    """Return the (sort value, post_id) a cursor points past, or raise ValueError."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        cursor_sort_by, cursor_sort_order, value, post_id = json.loads(base64.urlsafe_b64decode(padded))
+        post_id = int(post_id)
+    except (ValueError, TypeError):
+        raise ValueError("Malformed cursor")
+    # Sort values are strings (dates), integers or NULL; anything else
+    # would reach the query as a parameter MySQL can't bind
+    if value is not None and (isinstance(value, bool) or not isinstance(value, (str, int))):
+        raise ValueError("Malformed cursor")
+    if cursor_sort_by != sort_by or cursor_sort_order != sort_order:
+        raise ValueError("Cursor does not match the requested sort order")
+    return value, post_id
+
+def keyset_condition(sort_by, sort_order, last_value, last_post_id):
+    """Condition and params selecting rows strictly after the cursor position.
+
+    post_id breaks ties so rows sharing a sort value are never skipped or
+    repeated, no matter how many posts are inserted while the user scrolls.
+    MySQL sorts NULLs first ascending and last descending, and `= NULL`
+    matches nothing, so a cursor on a NULL sort value gets its own branch.
+    """
+    op = "<" if sort_order == "DESC" else ">"
+    if last_value is None:
+        if sort_order == "DESC":
+            return f"({sort_by} IS NULL AND post_id {op} %s)", [last_post_id]
+        return f"({sort_by} IS NOT NULL OR post_id {op} %s)", [last_post_id]
+    condition = f"{sort_by} {op} %s OR ({sort_by} = %s AND post_id {op} %s)"
+    if sort_order == "DESC":
+        condition += f" OR {sort_by} IS NULL"
+    return f"({condition})", [last_value, last_value, last_post_id]
+
+POST_LIST_COLUMNS = "post_id, caption, media_url, impressions, likes, comments, post_datetime"
+
+def fetch_post_page(cursor, args, sort_by, sort_order, limit, cursor_token=""):
+    """Run one keyset-paginated posts query.
+
+    Returns the page of rows (with raw column values) and the cursor for the
+    next page, or None when this is the last one. Raises ValueError for a
+    malformed or mismatched cursor.
+    """
+    conditions, params = build_post_filters(args)
+    if cursor_token:
+        condition, condition_params = keyset_condition(
+            sort_by, sort_order, *decode_cursor(cursor_token, sort_by, sort_order)
+        )
+        conditions.append(condition)
+        params.extend(condition_params)
+
+    query = f"SELECT {POST_LIST_COLUMNS} FROM posts WHERE 1=1"
+    for condition in conditions:
+        query += f" AND {condition}"
+    # Fetch one extra row to learn whether another page exists
+    query += f" ORDER BY {sort_by} {sort_order}, post_id {sort_order} LIMIT %s"
+    params.append(limit + 1)
+
+    cursor.execute(query, params)
+    posts = cursor.fetchall()
+    next_cursor = None
+    if len(posts) > limit:
+        posts = posts[:limit]
+        next_cursor = encode_cursor(sort_by, sort_order, posts[-1])
+    return posts, next_cursor
+
+@bp.route("/api/posts")
+@response_cache.cached("posts")
 def api_posts():
     try:
-        offset = int(request.args.get("offset", 0))
-        limit = int(request.args.get("limit", 20))
+        offset = max(int(request.args.get("offset", 0)), 0)
+        limit = min(max(int(request.args.get("limit", 20)), 1), MAX_PAGE_SIZE)
         sort_by = request.args.get("sort_by", "post_datetime")
         sort_order = request.args.get("sort_order", "desc").upper()
-        date_from = request.args.get("date_from")
-        date_to = request.args.get("date_to")
-        likes_min = request.args.get("likes_min")
-        likes_max = request.args.get("likes_max")
-        impressions_min = request.args.get("impressions_min")
-        impressions_max = request.args.get("impressions_max")
-        comments_min = request.args.get("comments_min")
-        comments_max = request.args.get("comments_max")
-
-        # Whitelist to prevent injection
-        valid_sort_columns = ["post_datetime", "likes", "comments", "impressions"]
-        if sort_by not in valid_sort_columns:
+        # Passing `cursor` (empty for the first page) switches to keyset mode
+        cursor_mode = "cursor" in request.args
+
+        if sort_by not in VALID_SORT_COLUMNS:
             sort_by = "post_datetime"
         if sort_order not in ["ASC", "DESC"]:
             sort_order = "DESC"
 
-        query = """SELECT post_id, caption, impressions, likes, comments, post_datetime
-                   FROM posts WHERE 1=1"""
-        params = []
-
-        if date_from:
-            query += " AND post_datetime >= %s"
-            params.append(date_from)
-        if date_to:
-            query += " AND post_datetime <= %s"
-            params.append(date_to)
-        if likes_min:
-            query += " AND likes >= %s"
-            params.append(likes_min)
-        if likes_max:
-            query += " AND likes <= %s"
-            params.append(likes_max)
-        if impressions_min:
-            query += " AND impressions >= %s"
-            params.append(impressions_min)
-        if impressions_max:
-            query += " AND impressions <= %s"
-            params.append(impressions_max)
-        if comments_min:
-            query += " AND comments >= %s"
-            params.append(comments_min)
-        if comments_max:
-            query += " AND comments <= %s"
-            params.append(comments_max)
-
-        query += f" ORDER BY {sort_by} {sort_order} LIMIT %s OFFSET %s"
-        params.extend([limit, offset])
-
         with get_db_connection() as conn:
             cursor = conn.cursor(dictionary=True)
-            cursor.execute(query, params)
-            posts = cursor.fetchall()
+
+            if cursor_mode:
+                try:
+                    posts, next_cursor = fetch_post_page(
+                        cursor, request.args, sort_by, sort_order, limit, request.args.get("cursor", "")
+                    )
+                except ValueError as err:
+                    return jsonify({"error": str(err)}), 400
+            else:
+                conditions, params = build_post_filters(request.args)
+                query = f"SELECT {POST_LIST_COLUMNS} FROM posts WHERE 1=1"
+                for condition in conditions:
+                    query += f" AND {condition}"
+                query += f" ORDER BY {sort_by} {sort_order} LIMIT %s OFFSET %s"
+                params.extend([limit, offset])
+                cursor.execute(query, params)
+                posts = cursor.fetchall()
 
             for post in posts:
                 if "post_id" in post and post["post_id"] is not None:
@@ -154,30 +319,88 @@ def api_posts():
                 if post.get("post_datetime"):
                     post["post_datetime"] = post["post_datetime"].strftime("%d %B %Y")
 
+            if cursor_mode:
+                return jsonify({"posts": posts, "next_cursor": next_cursor})
             return jsonify(posts)
 
     except mysql.connector.Error as err:
-        app.logger.error(f"Database error: {err}")
+        current_app.logger.error(f"Database error: {err}")
+        return jsonify({"error": "Database error"}), 500
+
+@bp.route("/api/posts/export")
+def export_posts():
+    """Stream every post matching the /api/posts filters as a file.
+
+    ?format=csv (default), ndjson, parquet or arrow (the last two need
+    pyarrow); ?columns=post_id,likes,... picks the columns. Rows come from
+    an unbuffered cursor and are written in chunks as they arrive, so memory
+    stays flat however large the table is.
+    """
+    fmt = request.args.get("format", "csv").lower()
+    try:
+        post_export.check_format(fmt)
+        columns = post_export.parse_columns(request.args.get("columns"))
+    except ValueError as err:
+        return jsonify({"error": str(err)}), 400
+
+    conditions, params = build_post_filters(request.args)
+    query = f"SELECT {', '.join(columns)} FROM posts WHERE 1=1"
+    for condition in conditions:
+        query += f" AND {condition}"
+    query += " ORDER BY post_id"
+
+    # The connection stays checked out until the response is closed
+    conn = None
+    try:
+        conn = db_connection_pool.acquire()
+        cursor = instrumentation.InstrumentedConnection(conn, SLOW_QUERY_SECONDS).cursor(buffered=False)
+        cursor.execute(query, params)
+    except mysql.connector.Error as err:
+        if conn is not None:
+            db_connection_pool.discard(conn)
+        current_app.logger.error(f"Database error: {err}")
         return jsonify({"error": "Database error"}), 500
 
-@app.route("/post/<int:post_id>")
+    streamed = {"complete": False}
+
+    def generate():
+        yield from post_export.write_rows(cursor, columns, fmt)
+        streamed["complete"] = True
+
+    def return_connection():
+        # A stream cut short leaves unread rows on the connection; draining
+        # them could mean reading most of the table, so close it instead
+        if streamed["complete"]:
+            db_connection_pool.release(conn)
+        else:
+            db_connection_pool.discard(conn)
+
+    response = Response(stream_with_context(generate()), content_type=post_export.FORMATS[fmt])
+    response.call_on_close(return_connection)
+    response.headers["Content-Disposition"] = f'attachment; filename="posts.{fmt}"'
+    return response
+
+SIMILAR_POSTS_LIMIT = 10
+
+@bp.route("/post/<int:post_id>")
+@response_cache.cached("post:{post_id}")
 def show_post_details(post_id):
-    app.logger.info(f"Request received for post ID: {post_id}")
+    current_app.logger.info(f"Request received for post ID: {post_id}")
     try:
+        similarity_index.ensure_loaded(get_db_connection)
+        similar, latest = similarity_index.similar(post_id, SIMILAR_POSTS_LIMIT)
+        similar_ids = [similar_id for similar_id, _ in similar]
+
         with get_db_connection() as conn:
             cursor = conn.cursor(dictionary=True)
-            
-            # Fetch the main post
-            cursor.execute("SELECT * FROM posts WHERE post_id = %s", (post_id,))
-            post = cursor.fetchone()
-
-            if not post:
-                return "Post not found", 404
 
-            if post and post.get('post_datetime'):
-                post['post_datetime'] = post['post_datetime'].strftime('%d %B %Y')
+            # The post and its similar posts in one primary-key lookup
+            ids = [post_id] + similar_ids
+            cursor.execute(f"SELECT * FROM posts WHERE post_id IN ({', '.join(['%s'] * len(ids))})", ids)
+            rows = {int(row['post_id']): row for row in cursor.fetchall()}
 
-            # Fetch topics for the current post
+            # The post's own topics come from the database: the in-memory
+            # index may not have seen a save made by another worker yet
             cursor.execute("""
                 SELECT t.id, t.name
                 FROM topics t
@@ -186,45 +409,37 @@ def show_post_details(post_id):
             """, (post_id,))
             topics = cursor.fetchall()
 
-            # Fetch similar posts
-            cursor.execute("""
-                SELECT p.post_id, p.media_url, p.caption, p.impressions, p.likes, p.comments, p.reposts
-                FROM posts p
-                JOIN topic_posts tp ON p.post_id = tp.post_id
-                WHERE tp.topic_id IN (
-                    SELECT topic_id FROM topic_posts WHERE post_id = %s
-                ) AND p.post_id != %s
-                GROUP BY p.post_id
-                ORDER BY p.post_datetime DESC
-                LIMIT 10
-            """, (post_id, post_id))
-            similar_posts = cursor.fetchall()
-
-            # Fetch the most recent post date among similar posts
-            most_recent_post_info = None
-            if similar_posts:
-                cursor.execute("""
-                    SELECT p.post_id, p.post_datetime
-                    FROM posts p
-                    JOIN topic_posts tp ON p.post_id = tp.post_id
-                    WHERE tp.topic_id IN (
-                        SELECT topic_id FROM topic_posts WHERE post_id = %s
-                    )
-                    ORDER BY p.post_datetime DESC
-                    LIMIT 1
-                """, (post_id,))
-                most_recent_post_info = cursor.fetchone()
-                if most_recent_post_info and most_recent_post_info.get('post_datetime'):
-                    most_recent_post_info['post_datetime'] = most_recent_post_info['post_datetime'].strftime('%d %B %Y')
+        post = rows.get(post_id)
+        if not post:
+            return "Post not found", 404
+
+        if post.get('post_datetime'):
+            post['post_datetime'] = post['post_datetime'].strftime('%d %B %Y')
 
-            return render_template('individual_post.html', post=post, topics=topics, similar_posts=similar_posts, most_recent_post_info=most_recent_post_info)
+        # Similar posts come from these topics, so new posts in them change the page
+        response_cache.depends_on(*(f"topic:{topic['id']}" for topic in topics))
+
+        # Ranked by shared topics, then recency
+        similar_posts = [rows[similar_id] for similar_id in similar_ids if similar_id in rows]
+
+        # The most recent post across this post's topics
+        most_recent_post_info = None
+        if similar_posts and latest:
+            latest_datetime, latest_id = latest
+            most_recent_post_info = {"post_id": latest_id,
+                                     "post_datetime": latest_datetime.strftime('%d %B %Y')}
+
+        return render_template('individual_post.html', post=post, topics=topics, similar_posts=similar_posts, most_recent_post_info=most_recent_post_info)
 
     except mysql.connector.Error as err:
-        app.logger.error(f"Database error: {err}")
+        current_app.logger.error(f"Database error: {err}")
         return "Database error", 500
 
 
-@app.route("/topic/<int:topic_id>")
+TOPIC_POSTS_PER_PAGE = 20
+
+@bp.route("/topic/<int:topic_id>")
+@response_cache.cached("topic:{topic_id}")
 def show_topic_details(topic_id):
     try:
         with get_db_connection() as conn:
@@ -237,118 +452,207 @@ def show_topic_details(topic_id):
             if not topic:
                 return "Topic not found", 404
 
-            # Fetch all posts for this topic
-            cursor.execute("""
-                SELECT p.*
-                FROM posts p
-                JOIN topic_posts tp ON p.post_id = tp.post_id
-                WHERE tp.topic_id = %s
-                ORDER BY p.post_datetime DESC
-            """, (topic_id,))
-            posts = cursor.fetchall()
-
-            # Fetch relevant topics
-            cursor.execute("""
-                SELECT t.id, t.name, COUNT(t.id) as post_count
-                FROM topics t
-                JOIN topic_posts tp ON t.id = tp.topic_id
-                WHERE tp.post_id IN (
-                    SELECT post_id FROM topic_posts WHERE topic_id = %s
-                ) AND t.id != %s
-                GROUP BY t.id, t.name
-                ORDER BY post_count DESC
-                LIMIT 10
-            """, (topic_id, topic_id))
-            relevant_topics = cursor.fetchall()
-
-            total_posts = len(posts)
+            # First page of posts; topic.js follows next_cursor through /api/posts
+            posts, next_cursor = fetch_post_page(
+                cursor, {"topic_id": topic_id}, "post_datetime", "DESC", TOPIC_POSTS_PER_PAGE
+            )
+
+            # Precomputed aggregates and related topics
+            total_posts, last_post_datetime, stats = topic_stats.fetch_topic_stats(cursor, topic_id)
+            relevant_topics = topic_stats.fetch_related_topics(cursor, topic_id)
+
             last_post_date = ""
-            if posts:
-                last_post_date = posts[0]['post_datetime'].strftime('%d %B %Y')
-
-            # Calculate stats
-            likes = [p['likes'] for p in posts if p['likes'] is not None]
-            impressions = [p['impressions'] for p in posts if p['impressions'] is not None]
-            comments = [p['comments'] for p in posts if p['comments'] is not None]
-
-            stats = {
-                'avg_likes': statistics.mean(likes) if likes else 0,
-                'median_likes': statistics.median(likes) if likes else 0,
-                'avg_impressions': statistics.mean(impressions) if impressions else 0,
-                'median_impressions': statistics.median(impressions) if impressions else 0,
-                'avg_comments': statistics.mean(comments) if comments else 0,
-                'median_comments': statistics.median(comments) if comments else 0,
-            }
+            if last_post_datetime:
+                last_post_date = last_post_datetime.strftime('%d %B %Y')
 
             return render_template('topic.html',
                                    topic=topic,
                                    posts=posts,
+                                   next_cursor=next_cursor,
                                    total_posts=total_posts,
                                    last_post_date=last_post_date,
                                    stats=stats,
                                    relevant_topics=relevant_topics)
 
     except mysql.connector.Error as err:
-        app.logger.error(f"Database error in topic details: {err}")
+        current_app.logger.error(f"Database error in topic details: {err}")
         return "Database error", 500
     
 
-@app.route("/api/topics")
+@bp.route("/api/topics")
+@response_cache.cached("topics")
 def api_topics():
+    try:
+        topic_index.ensure_loaded(get_db_connection)
+        etag = topic_index.etag
+        if request.if_none_match.contains(etag):
+            return "", 304, {"ETag": f'"{etag}"'}
+        response = jsonify(topic_index.all())
+        response.set_etag(etag)
+        return response
+    except mysql.connector.Error as err:
+        current_app.logger.error(f"Database error: {err}")
+        return jsonify({"error": "Database error"}), 500
+
+
+def topic_exists(cursor, topic_id):
+    # Checked in MySQL: the topic index may not have seen topics created
+    # by other workers yet
+    cursor.execute("SELECT 1 FROM topics WHERE id = %s", (topic_id,))
+    return cursor.fetchone() is not None
+
+def stats_response(cursor, topic_id):
+    result = topic_stats.fetch_topic_summary(cursor, topic_id)
+    post_count, last_post_datetime, metrics = result or (0, None, topic_stats.summarize(topic_stats.new_sketches()))
+    return jsonify({
+        "post_count": post_count,
+        "last_post_datetime": last_post_datetime.strftime('%Y-%m-%d %H:%M:%S') if last_post_datetime else None,
+        "metrics": metrics,
+    })
+
+@bp.route("/api/topics/<int:topic_id>/stats")
+def api_topic_stats(topic_id):
     try:
         with get_db_connection() as conn:
-            cursor = conn.cursor(dictionary=True)
-            cursor.execute("SELECT id, name FROM topics")
-            topics = cursor.fetchall()
-            return jsonify(topics)
+            cursor = conn.cursor()
+            if not topic_exists(cursor, topic_id):
+                return jsonify({"error": "Topic not found"}), 404
+            return stats_response(cursor, topic_id)
+    except mysql.connector.Error as err:
+        current_app.logger.error(f"Database error: {err}")
+        return jsonify({"error": "Database error"}), 500
+
+@bp.route("/api/stats")
+def api_global_stats():
+    try:
+        with get_db_connection() as conn:
+            return stats_response(conn.cursor(), topic_stats.GLOBAL_TOPIC_ID)
+    except mysql.connector.Error as err:
+        current_app.logger.error(f"Database error: {err}")
+        return jsonify({"error": "Database error"}), 500
+
+@bp.route("/api/aggregates")
+@response_cache.cached("posts")
+def api_aggregates():
+    """Per-bucket post counts, sums and per-post averages of metrics.
+
+    ?bucket=day|week|month (default week), ?metrics=impressions,likes
+    (default: all), ?topic_id= to restrict to one topic, and
+    ?date_from=/?date_to= (YYYY-MM-DD) to bound the publish days. Buckets
+    without posts are left out.
+    """
+    bucket = request.args.get("bucket", "week")
+    if bucket not in topic_stats.BUCKET_STARTS:
+        choices = ', '.join(topic_stats.BUCKET_STARTS)
+        return jsonify({"error": f"Unknown bucket: {bucket}; use one of {choices}"}), 400
+    metrics = [m for m in request.args.get("metrics", "").split(",") if m] or file_handler.METRIC_COLUMNS
+    unknown = [m for m in metrics if m not in file_handler.METRIC_COLUMNS]
+    if unknown:
+        return jsonify({"error": f"Unknown metrics: {', '.join(unknown)}"}), 400
+    dates = {}
+    for arg in ("date_from", "date_to"):
+        value = request.args.get(arg)
+        if value:
+            try:
+                dates[arg] = datetime.strptime(value, "%Y-%m-%d").date()
+            except ValueError:
+                return jsonify({"error": f"{arg} must be a YYYY-MM-DD date"}), 400
+
+    topic_id = request.args.get("topic_id")
+    if topic_id is not None:
+        try:
+            topic_id = int(topic_id)
+        except ValueError:
+            return jsonify({"error": "topic_id must be an integer"}), 400
+
+    try:
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            if topic_id is not None and not topic_exists(cursor, topic_id):
+                return jsonify({"error": "Topic not found"}), 404
+            rows = topic_stats.fetch_metric_buckets(
+                cursor, topic_stats.GLOBAL_TOPIC_ID if topic_id is None else topic_id, bucket, metrics,
+                dates.get("date_from"), dates.get("date_to"),
+            )
+        return jsonify({
+            "bucket": bucket,
+            "topic_id": topic_id,
+            "buckets": [
+                {
+                    "start": start.strftime("%Y-%m-%d"),
+                    "posts": post_count,
+                    "sum": sums,
+                    "avg": {metric: round(total / post_count, 2) if post_count else 0
+                            for metric, total in sums.items()},
+                }
+                for start, post_count, sums in rows
+            ],
+        })
     except mysql.connector.Error as err:
-        app.logger.error(f"Database error: {err}")
+        current_app.logger.error(f"Database error: {err}")
         return jsonify({"error": "Database error"}), 500
 
 
-@app.route("/api/search-suggestions")
+@bp.route("/api/search-suggestions")
 def search_suggestions():
     query = request.args.get("query", "")
     if not query:
         return jsonify({"topics": [], "posts": []})
 
     try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor(dictionary=True)
+        # Search for topics
+        topic_index.ensure_loaded(get_db_connection)
+        topics_suggestions = topic_index.search(query, limit=SEARCH_SUGGESTION_LIMIT)
 
-            # Search for topics
-            cursor.execute("SELECT id, name FROM topics WHERE name LIKE %s", (f"%{query}%",))
-            topics = cursor.fetchall()
+        # Search for posts
+        post_search_index.ensure_loaded(get_db_connection)
+        posts = post_search_index.search(query, limit=SEARCH_SUGGESTION_LIMIT)
 
-            # Search for posts
-            cursor.execute(
-                "SELECT p.post_id, p.caption FROM posts p "
-                "LEFT JOIN topic_posts tp ON p.post_id = tp.post_id "
-                "LEFT JOIN topics t ON tp.topic_id = t.id "
-                "WHERE p.caption LIKE %s OR t.name LIKE %s OR p.post_id LIKE %s",
-                (f"%{query}%", f"%{query}%", f"%{query}%"),
-            )
-            posts = cursor.fetchall()
-            
-            topics_suggestions = [{"id": topic['id'], "name": topic['name']} for topic in topics]
-            posts_suggestions = [{"post_id": str(post['post_id']), "caption": post['caption']} for post in posts]
-
-            return jsonify({
-                "topics": topics_suggestions,
-                "posts": posts_suggestions
-            })
+        posts_suggestions = [{"post_id": str(post_id), "caption": caption} for post_id, caption in posts]
+
+        return jsonify({
+            "topics": topics_suggestions,
+            "posts": posts_suggestions
+        })
     except mysql.connector.Error as err:
-        app.logger.error(f"Database error: {err}")
+        current_app.logger.error(f"Database error: {err}")
         return jsonify({"error": "Database error"}), 500
 
-@app.route("/api/save-post", methods=['POST'])
+@bp.route("/api/save-post", methods=['POST'])
 def save_post():
-    data = request.get_json()
-    post_data = data.get('post_data')
-    tags = data.get('tags')
-
-    if not post_data or not tags:
+    """Save one post ({post_data, tags}) or a batch ({posts: [{post_data, tags}, ...]}).
+
+    Saving a post that already exists refreshes its metrics; tags may then
+    be omitted.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"error": "Expected a JSON object"}), 400
+    batch = 'posts' in data
+    items = (data.get('posts') or []) if batch else [data]
+    if not isinstance(items, list):
+        return jsonify({"error": "posts must be a list"}), 400
+
+    entries = []
+    for item in items:
+        if not isinstance(item, dict):
+            return jsonify({"error": "Each post must be an object"}), 400
+        post_data = item.get('post_data')
+        tags = item.get('tags') or []
+        if not isinstance(post_data, dict) or not post_data.get('post_id'):
+            return jsonify({"error": "Missing data"}), 400
+        if not isinstance(tags, list) or not all(isinstance(tag, str) for tag in tags):
+            return jsonify({"error": "tags must be a list of strings"}), 400
+        tags = [tag.strip() for tag in tags if tag.strip()]
+        entries.append((post_data, tags))
+    if not entries:
         return jsonify({"error": "Missing data"}), 400
+    if len({str(post_data['post_id']) for post_data, _ in entries}) != len(entries):
+        return jsonify({"error": "Duplicate post_id in batch"}), 400
+
+    unknown = post_store.unknown_columns(entries)
+    if unknown:
+        return jsonify({"error": f"Unknown post fields: {', '.join(unknown)}"}), 400
 
     try:
         with get_db_connection() as conn:
@@ -356,54 +660,200 @@ def save_post():
             conn.start_transaction()
 
             try:
-                # Prepare post data
-                post_columns = [key for key in post_data.keys() if key != 'media_url']
-                post_values = [post_data[key] for key in post_columns]
-                
-                # Handle media_url separately
-                if 'media_url' in post_data and post_data['media_url']:
-                    post_columns.append('media_url')
-                    post_values.append(post_data['media_url'])
-
-                query = f"INSERT INTO posts ({', '.join(post_columns)}) VALUES ({', '.join(['%s'] * len(post_columns))})"
-                cursor.execute(query, post_values)
-                post_id = post_data['post_id']
-
-                # Handle topics
-                topic_ids = []
-                for tag in tags:
-                    cursor.execute("SELECT id FROM topics WHERE name = %s", (tag,))
-                    result = cursor.fetchone()
-                    if result:
-                        topic_ids.append(result[0])
-                    else:
-                        cursor.execute("INSERT INTO topics (name) VALUES (%s)", (tag,))
-                        topic_ids.append(cursor.lastrowid)
-
-                # Associate topics with post
-                for topic_id in topic_ids:
-                    cursor.execute("INSERT INTO topic_posts (post_id, topic_id) VALUES (%s, %s)", (post_id, topic_id))
-
+                post_topic_ids, created_topics, captions = post_store.save_posts(cursor, entries)
                 conn.commit()
-                return jsonify({"success": True, "post_id": post_id}), 201
-
+            except post_store.MissingTagsError as err:
+                conn.rollback()
+                return jsonify({"error": str(err)}), 400
             except mysql.connector.Error as err:
                 conn.rollback()
-                app.logger.error(f"Database transaction error: {err}")
+                current_app.logger.error(f"Database transaction error: {err}")
                 return jsonify({"error": "Database error during transaction"}), 500
 
+            # A refresh never changes the caption, so index the stored one
+            for (post_data, tags), caption in zip(entries, captions):
+                post_search_index.add_post(post_data['post_id'], caption, tags)
+            for topic_id, name in created_topics:
+                topic_index.add(topic_id, name)
+            for (post_data, _), topic_ids in zip(entries, post_topic_ids):
+                similarity_index.add_post(post_data['post_id'], post_data.get('post_datetime'), topic_ids)
+
+            response_cache.bump(
+                "posts",
+                *(f"post:{post_data['post_id']}" for post_data, _ in entries),
+                *(f"topic:{topic_id}" for ids in post_topic_ids for topic_id in ids),
+                *(["topics"] if created_topics else []),
+            )
+
+            post_ids = [post_data['post_id'] for post_data, _ in entries]
+            if batch:
+                return jsonify({"success": True, "post_ids": post_ids}), 201
+            return jsonify({"success": True, "post_id": post_ids[0]}), 201
+
     except mysql.connector.Error as err:
-        app.logger.error(f"Database connection error: {err}")
+        current_app.logger.error(f"Database connection error: {err}")
         return jsonify({"error": "Database connection error"}), 500
 
+@bp.route("/api/posts/<int:post_id>/timeseries")
+def post_timeseries(post_id):
+    """Metric snapshots of one post, oldest first (?metrics=likes,impressions&since=YYYY-MM-DD)."""
+    metrics = [m for m in request.args.get("metrics", "").split(",") if m] or file_handler.METRIC_COLUMNS
+    unknown = sorted(set(metrics) - set(file_handler.METRIC_COLUMNS))
+    if unknown:
+        return jsonify({"error": f"Unknown metrics: {', '.join(unknown)}"}), 400
+
+    try:
+        with get_db_connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            points = post_store.fetch_timeseries(cursor, post_id, metrics, request.args.get("since"))
+            if not points:
+                cursor.execute("SELECT 1 FROM posts WHERE post_id = %s", (post_id,))
+                if not cursor.fetchall():
+                    return jsonify({"error": "Post not found"}), 404
+
+            for point in points:
+                point["captured_at"] = point["captured_at"].strftime('%Y-%m-%d %H:%M:%S')
+            return jsonify({"post_id": str(post_id), "points": points})
+    except mysql.connector.Error as err:
+        current_app.logger.error(f"Database error: {err}")
+        return jsonify({"error": "Database error"}), 500
 
-@app.errorhandler(404)
+# Media names never change meaning (new downloads are content-addressed and
+# legacy per-post files are never rewritten), so browsers may cache them forever
+MEDIA_MAX_AGE = 365 * 24 * 3600
+
+@bp.route("/media/<path:filename>")
+def media(filename):
+    response = send_from_directory(file_handler.media_store.root, filename, max_age=MEDIA_MAX_AGE)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+def collect_gauges():
+    pool = db_connection_pool.stats()
+    cache = response_cache.stats()
+    return [
+        ("db_pool_connections", "gauge", "Pooled MySQL connections by state",
+         [({"state": "in_use"}, pool["in_use"]), ({"state": "idle"}, pool["idle"])]),
+        ("db_pool_size", "gauge", "Maximum pooled MySQL connections", [({}, pool["size"])]),
+        ("db_pool_acquisitions_total", "counter", "Connection acquisitions by outcome",
+         [({"outcome": outcome}, pool[outcome]) for outcome in ("hits", "misses", "waits", "timeouts")]),
+        ("db_pool_wait_seconds_total", "counter", "Time spent waiting for a pooled connection",
+         [({}, pool["wait_time_total"])]),
+        ("db_pool_reconnects_total", "counter", "Connections replaced after failing a ping",
+         [({}, pool["reconnects"])]),
+        ("response_cache_lookups_total", "counter", "Response cache lookups by result",
+         [({"result": "hit"}, cache["hits"]), ({"result": "miss"}, cache["misses"])]),
+        ("response_cache_entries", "gauge", "Entries in the in-process response cache",
+         [({}, cache["entries"])]),
+        ("log_records_dropped_total", "counter", "Log records dropped because the log queue was full",
+         [({}, logging_setup.dropped_records())]),
+    ]
+
+instrumentation.registry.add_collector(collect_gauges)
+
+@bp.route("/metrics")
+def metrics():
+    """Prometheus scrape endpoint."""
+    return Response(instrumentation.registry.render(), mimetype="text/plain; version=0.0.4")
+
+@bp.route("/api/db-pool-stats")
+def db_pool_stats():
+    return jsonify(db_connection_pool.stats())
+
+
+@bp.cli.command("migrate")
+@click.option("--status", is_flag=True, help="List pending migrations without applying them.")
+def migrate_command(status):
+    """Apply the schema migrations in migrations/ that have not run yet."""
+    with get_db_connection() as conn:
+        if status:
+            names = migrate.pending(conn)
+            print("\n".join(names) if names else "Schema is up to date.")
+            return
+        names = migrate.migrate(conn)
+        # The aggregate tables start empty, and their quantile sketches can
+        # only be computed in Python; fill them once every migration is in
+        if migrate.AGGREGATES_MIGRATION in names:
+            topic_stats.rebuild(conn)
+    print(f"Applied {len(names)} migrations." + "".join(f"\n  {name}" for name in names))
+    if migrate.AGGREGATES_MIGRATION in names:
+        print("Rebuilt topic_stats and topic_cooccurrence from existing posts.")
+
+
+@bp.cli.command("refresh-topic-stats")
+def refresh_topic_stats_command():
+    """Rebuild the topic_stats and topic_cooccurrence tables (run `migrate` first)."""
+    with get_db_connection() as conn:
+        count = topic_stats.rebuild(conn)
+    print(f"Refreshed stats for {count} topics.")
+
+
+@bp.app_errorhandler(404)
 def not_found(e):
     return jsonify({"error": "Not found"}), 404
 
-@app.errorhandler(500)
+@bp.app_errorhandler(500)
 def server_error(e):
     return jsonify({"error": "Internal server error"}), 500
 
+@bp.before_app_request
+def start_job_workers():
+    # Started lazily so CLI commands and a preloading gunicorn master never
+    # run job workers; returns at once after the first request
+    job_queue.start()
+
+
+def create_app():
+    """Build the Flask app.
+
+    Service objects (pool, indexes, caches, job queue) are module-level and
+    shared by every app in the process. Under gunicorn with preload_app the
+    master imports this module and builds the app once; each forked worker
+    then calls after_fork (see gunicorn.conf.py).
+    """
+    global log_listener
+    if log_listener is None:
+        log_listener = logging_setup.setup_logging()
+
+    app = Flask(__name__, instance_path=INSTANCE_PATH)
+    CORS(app)
+    # For session storage
+    app.secret_key = os.getenv("SECRET_KEY")
+
+    # Request timers, per-statement DB timing and the opt-in sampling profiler
+    instrumentation.init_app(app, instrumentation.RequestProfiler(
+        sample_rate=float(os.getenv("PROFILE_SAMPLE_RATE", 0)),
+        directory=os.getenv("PROFILE_DIR", os.path.join(INSTANCE_PATH, "profiles")),
+    ))
+    app.register_blueprint(bp)
+    job_queue.init_app(app)
+    return app
+
+
+def after_fork():
+    """Per-worker setup in a process forked from a preloaded parent.
+
+    Threads don't survive fork, so the log writer is replaced and job
+    workers started here; connections inherited from the parent are dropped.
+    """
+    global log_listener
+    log_listener = logging_setup.setup_logging()
+    db_connection_pool.reset_after_fork()
+    job_queue.reset_after_fork()
+    job_queue.start()
+
+
+def shutdown(timeout=10.0):
+    """Graceful worker exit: finish jobs, drain the DB pool, flush logs."""
+    job_queue.stop(timeout)
+    still_in_use = db_connection_pool.close(timeout)
+    if still_in_use:
+        logging.getLogger(__name__).warning(f"Closed the DB pool with {still_in_use} connections checked out")
+    if log_listener is not None:
+        logging_setup.stop_listener(log_listener)
+
+
 if __name__ == "__main__":
-    app.run(debug=True)
+    # Development server only; production runs under gunicorn (gunicorn.conf.py)
+    create_app().run(debug=os.getenv("FLASK_DEBUG") == "1")
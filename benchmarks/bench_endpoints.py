@@ -0,0 +1,195 @@
+"""Latency and throughput of the dashboard endpoints on synthetic data.
+
+For each --sizes value the benchmark database is re-seeded (see seed.py)
+and every case below is requested --requests times through Flask's test
+client from --threads threads, reporting requests per second and p50/p99
+latency. The client calls the app in-process, so the numbers cover the
+app and MySQL without HTTP; load_test.py measures a real server. Then
+batches of generated exports are imported with import_files against
+mock_linkedin, first with an empty scrape cache and then with a warm one.
+Run from the repository root with the app's .env in place:
+
+    python benchmarks/bench_endpoints.py --sizes 10000 100000 1000000
+    python benchmarks/bench_endpoints.py --sizes 100000 --no-seed --requests 1000
+    python benchmarks/bench_endpoints.py --sizes 10000 --import-files 0
+
+Data goes into --database (default content_os_bench), never the database
+in .env. The response cache is disabled unless --cache is given, so each
+request reaches MySQL. Media, caches and job files go to a temporary
+directory.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [BENCHMARKS, os.path.dirname(BENCHMARKS)]
+
+# file_handler opens its media store and scrape cache when imported;
+# keep all of it out of the repository
+WORK_DIR = tempfile.mkdtemp(prefix="content-os-bench-")
+for name, file in (("JOBS_DB_PATH", "jobs.sqlite3"), ("JOBS_UPLOAD_DIR", "uploads"), ("MEDIA_ROOT", "media"),
+                   ("MEDIA_INDEX_PATH", "media.sqlite3"), ("SCRAPE_CACHE_PATH", "scrape_cache.sqlite3")):
+    os.environ[name] = os.path.join(WORK_DIR, file)
+
+import bench_parse  # noqa: E402
+import file_handler  # noqa: E402
+import mock_linkedin  # noqa: E402
+import seed  # noqa: E402
+from load_test import report  # noqa: E402
+
+
+def endpoint_cases(topics):
+    """(label, rng -> path) for each request shape being measured."""
+    def post_id(rng, posts):
+        return seed.post_id(rng.randrange(posts))
+
+    def date_from(rng):
+        return (seed.START + seed.SPAN * rng.random()).strftime("%Y-%m-%d")
+
+    return [
+        ("/api/posts newest", lambda rng, posts: "/api/posts?limit=20"),
+        ("/api/posts by likes", lambda rng, posts: "/api/posts?limit=20&sort_by=likes&sort_order=desc"),
+        ("/api/posts offset 2000", lambda rng, posts: "/api/posts?limit=20&sort_by=impressions&offset=2000"),
+        ("/api/posts keyset", lambda rng, posts: "/api/posts?limit=20&sort_by=comments&sort_order=asc&cursor="),
+        ("/api/posts likes+date", lambda rng, posts:
+            f"/api/posts?limit=20&sort_by=likes&likes_min=50&date_from={date_from(rng)}"),
+        ("/api/posts topic", lambda rng, posts:
+            f"/api/posts?limit=20&topic_id={rng.randint(1, topics)}"),
+        ("/api/search-suggestions", lambda rng, posts:
+            f"/api/search-suggestions?query={rng.choice(seed.VOCABULARY)[:rng.randint(2, 5)]}"),
+        ("/post/<id>", lambda rng, posts: f"/post/{post_id(rng, posts)}"),
+        ("/topic/<id>", lambda rng, posts: f"/topic/{rng.randint(1, topics)}"),
+        ("/api/aggregates week", lambda rng, posts: "/api/aggregates?bucket=week"),
+        ("/api/aggregates topic", lambda rng, posts:
+            f"/api/aggregates?bucket=month&topic_id={rng.randint(1, topics)}"),
+    ]
+
+
+def run_case(client_factory, path_for, posts, requests, threads):
+    """Issue `requests` requests from `threads` threads; returns latencies, errors and wall time."""
+    def worker(worker_index):
+        client = client_factory()
+        rng = random.Random(worker_index)
+        latencies, errors = [], 0
+        for _ in range(requests // threads):
+            path = path_for(rng, posts)
+            start = time.perf_counter()
+            response = client.get(path)
+            elapsed = time.perf_counter() - start
+            if response.status_code == 200:
+                latencies.append(elapsed)
+            else:
+                errors += 1
+        return latencies, errors
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(worker, range(threads)))
+    elapsed = time.perf_counter() - start
+    latencies = [latency for worker_latencies, _ in results for latency in worker_latencies]
+    return latencies, sum(errors for _, errors in results), elapsed
+
+
+def bench_endpoints(content_app, flask_app, posts, topics, args):
+    # Loaded outside the timings, as in a long-running worker
+    for index in (content_app.post_search_index, content_app.topic_index, content_app.similarity_index):
+        index.reload(content_app.get_db_connection)
+    for label, path_for in endpoint_cases(topics):
+        run_case(flask_app.test_client, path_for, posts, min(args.requests, 20), 1)  # warm up
+        latencies, errors, elapsed = run_case(flask_app.test_client, path_for, posts, args.requests, args.threads)
+        report(label.ljust(24), latencies, errors, elapsed)
+
+
+def bench_imports(flask_app, directory, args):
+    os.makedirs(directory, exist_ok=True)
+    server, base_url = mock_linkedin.start(latency=args.scrape_latency / 1000)
+    try:
+        paths = bench_parse.write_exports(directory, args.import_files, args.import_format, 80, base_url)
+        batches = [paths[start:start + args.import_batch] for start in range(0, len(paths), args.import_batch)]
+        for label in ("imports cold", "imports warm"):
+            latencies, errors = [], 0
+            start = time.perf_counter()
+            for batch in batches:
+                uploads = [bench_parse.Upload(path) for path in batch]
+                try:
+                    batch_start = time.perf_counter()
+                    with flask_app.app_context():
+                        results = file_handler.import_files(uploads)
+                    latencies.append(time.perf_counter() - batch_start)
+                    errors += sum(not result["ok"] for result in results)
+                finally:
+                    for upload in uploads:
+                        upload.stream.close()
+            elapsed = time.perf_counter() - start
+            latencies.sort()
+            p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+            print(f"{label:<24} {len(paths) / elapsed:9.1f} files/s   "
+                  f"batch of {args.import_batch}: p50 {statistics.median(latencies) * 1000:7.1f} ms   "
+                  f"p99 {p99 * 1000:7.1f} ms   failed files {errors}")
+    finally:
+        server.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--database", default="content_os_bench")
+    parser.add_argument("--no-seed", action="store_true", help="reuse data from an earlier run (one size only)")
+    parser.add_argument("--requests", type=int, default=500, help="requests per endpoint case")
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--cache", action="store_true", help="keep the response cache enabled")
+    parser.add_argument("--import-files", type=int, default=200)
+    parser.add_argument("--import-batch", type=int, default=20)
+    parser.add_argument("--import-format", choices=("csv", "xlsx"), default="csv")
+    parser.add_argument("--scrape-latency", type=float, default=50.0, help="mock LinkedIn delay in milliseconds")
+    args = parser.parse_args()
+
+    seed.check_target(args.database)
+    os.environ["DB_NAME"] = args.database
+    os.environ["DB_POOL_SIZE"] = str(max(args.threads, 8) + 2)
+    os.environ["JOB_WORKERS"] = "0"
+    os.environ["LOG_FILE"] = ""
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    if not args.cache:
+        os.environ["RESPONSE_CACHE_MAX_ENTRIES"] = "0"
+
+    # Reads the settings above when imported
+    import app as content_app
+
+    flask_app = content_app.create_app()
+    config = {key: content_app.db_config[key] for key in ("host", "user", "password")}
+    conn = seed.connect(config, args.database)
+    try:
+        for posts in args.sizes:
+            if args.no_seed:
+                cursor = conn.cursor()
+                cursor.execute("SELECT COUNT(*), (SELECT COUNT(*) FROM topics) FROM posts")
+                posts, topics = cursor.fetchone()
+            else:
+                start = time.perf_counter()
+                topics = seed.seed(conn, posts)
+                print(f"Seeded {posts:,} posts and {topics:,} topics in "
+                      f"{timedelta(seconds=round(time.perf_counter() - start))}")
+            print(f"--- {posts:,} posts, {args.threads} threads, {args.requests} requests per case")
+            bench_endpoints(content_app, flask_app, posts, topics, args)
+            if args.no_seed:
+                break
+    finally:
+        conn.close()
+
+    if args.import_files:
+        print(f"--- {args.import_files} {args.import_format} exports, "
+              f"mock LinkedIn at {args.scrape_latency:.0f} ms")
+        bench_imports(flask_app, os.path.join(WORK_DIR, "exports"), args)
+    content_app.shutdown()
+
+
+if __name__ == "__main__":
+    main()
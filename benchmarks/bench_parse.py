@@ -0,0 +1,142 @@
+"""Compare analytics-export parsing throughput: pandas vs file_handler's streaming parser.
+
+Generates synthetic LinkedIn export files in a temporary directory and
+parses each one with both implementations, reporting the time per 1,000
+files. Run from the repository root:
+
+    python benchmarks/bench_parse.py --files 1000 --format csv
+    python benchmarks/bench_parse.py --files 200 --format xlsx
+
+The pandas baseline is skipped when pandas is not installed; the import
+cost of each parser's dependencies is measured in a fresh interpreter.
+"""
+import argparse
+import csv
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import file_handler  # noqa: E402
+
+
+class Upload:
+    """The parts of werkzeug's FileStorage the parsers use."""
+
+    def __init__(self, path):
+        self.filename = path
+        self.stream = open(path, 'rb')
+
+
+def export_rows(index, top_rows, base_url="https://www.linkedin.com"):
+    rows = [
+        ("Post URL", f"{base_url}/feed/update/urn:li:share:{7200000000000000000 + index}/"),
+        ("Post Date", "Mar 4, 2025"),
+        ("Post Publish Time", "9:30 AM"),
+        ("Impressions", f"{random.randint(100, 90000):,}"),
+        ("Members reached", str(random.randint(100, 50000))),
+        ("Reactions", str(random.randint(0, 900))),
+        ("Comments", str(random.randint(0, 120))),
+        ("Reposts", str(random.randint(0, 40))),
+        ("Saves", str(random.randint(0, 60))),
+        ("Sends on LinkedIn", str(random.randint(0, 30))),
+        ("Profile viewers from this post", str(random.randint(0, 300))),
+        ("Followers gained from this post", str(random.randint(0, 50))),
+        ("Visits to links in this post", str(random.randint(0, 200))),
+        (f"{file_handler.MAIN_EBOOK_URL}?utm_source=linkedin", str(random.randint(0, 80))),
+    ]
+    # Demographic breakdowns make up most of a real export
+    rows += [(f"top-{kind}-{n}", f"{random.random():.2%}")
+             for kind in ("job-title", "location", "industry", "company")
+             for n in range(top_rows // 4)]
+    return rows
+
+
+def write_exports(directory, count, fmt, top_rows, base_url="https://www.linkedin.com"):
+    """Write `count` exports; point `base_url` at mock_linkedin to import them for real."""
+    paths = []
+    for index in range(count):
+        path = os.path.join(directory, f"export-{index}.{fmt}")
+        rows = export_rows(index, top_rows, base_url)
+        if fmt == "csv":
+            with open(path, "w", newline="", encoding="utf-8") as f:
+                csv.writer(f).writerows(rows)
+        else:
+            from openpyxl import Workbook
+            workbook = Workbook()
+            for row in rows:
+                workbook.active.append(row)
+            workbook.save(path)
+        paths.append(path)
+    return paths
+
+
+def pandas_read_export(file):
+    """The parser file_handler used before the streaming one."""
+    import pandas as pd
+
+    if file.filename.endswith('.csv'):
+        df = pd.read_csv(file.stream, header=None, names=['key', 'value'])
+    else:
+        df = pd.read_excel(file.stream, header=None, names=['key', 'value'])
+    df.dropna(subset=['value'], inplace=True)
+    df = df[~df['key'].str.startswith('top-', na=False)]
+    return df.set_index('key')['value'].to_dict()
+
+
+def time_parser(parse, paths):
+    start = time.perf_counter()
+    for path in paths:
+        upload = Upload(path)
+        try:
+            data = parse(upload)
+            # Include the field conversions process_file does
+            for key in file_handler.EXPORT_KEYS:
+                file_handler._to_int(data.get(key, 0))
+        finally:
+            upload.stream.close()
+    return time.perf_counter() - start
+
+
+def import_time(module):
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-c", f"import {module}"], capture_output=True)
+    elapsed = time.perf_counter() - start
+    return elapsed if result.returncode == 0 else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=1000)
+    parser.add_argument("--format", choices=("csv", "xlsx"), default="csv")
+    parser.add_argument("--top-rows", type=int, default=80, help="top-* breakdown rows per export")
+    args = parser.parse_args()
+
+    try:
+        import pandas  # noqa: F401
+        parsers = {"pandas": pandas_read_export}
+    except ImportError:
+        print("pandas is not installed; reporting the streaming parser only")
+        parsers = {}
+    parsers["streaming"] = file_handler._read_export
+
+    baseline = import_time("sys")
+    for module in ("pandas", "csv", "openpyxl"):
+        elapsed = import_time(module)
+        if elapsed is not None:
+            print(f"import {module:<9} {max(elapsed - baseline, 0) * 1000:8.1f} ms")
+
+    with tempfile.TemporaryDirectory() as directory:
+        paths = write_exports(directory, args.files, args.format, args.top_rows)
+        for name, parse in parsers.items():
+            elapsed = time_parser(parse, paths)
+            print(f"{name:<10} {args.format}: {elapsed / len(paths) * 1000:8.2f} s per 1,000 files "
+                  f"({len(paths) / elapsed:,.0f} files/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""Throughput of /api/posts as gunicorn workers are added.
+
+For each worker count this starts `gunicorn -c gunicorn.conf.py` with
+GUNICORN_WORKERS set, waits until it answers, drives it with keep-alive
+HTTP clients for a fixed time and reports requests per second and latency
+percentiles. It needs the app's .env pointing at a MySQL database with
+posts in it. Run from the repository root:
+
+    python benchmarks/load_test.py --workers 1 2 4 8 --clients 32 --duration 20
+    python benchmarks/load_test.py --url http://127.0.0.1:8000 --clients 32   # existing server
+
+Clients are separate processes so the load generator itself isn't bound
+by one core; run it on another machine (or pin it with taskset) when
+measuring the server's scaling. `--no-cache` sets
+RESPONSE_CACHE_MAX_ENTRIES=0 so every request reaches MySQL.
+"""
+import argparse
+import http.client
+import multiprocessing
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import time
+from urllib.parse import urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def client(url, path, duration, results):
+    parts = urlsplit(url)
+    conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+    latencies, errors = [], 0
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            conn.request("GET", path)
+            response = conn.getresponse()
+            response.read()
+            if response.status != 200:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - start)
+        except (OSError, http.client.HTTPException):
+            errors += 1
+            conn.close()
+            conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+    results.put((latencies, errors))
+
+
+def run_load(url, path, clients, duration):
+    results = multiprocessing.Queue()
+    procs = [multiprocessing.Process(target=client, args=(url, path, duration, results))
+             for _ in range(clients)]
+    for proc in procs:
+        proc.start()
+    latencies, errors = [], 0
+    for _ in procs:
+        client_latencies, client_errors = results.get()
+        latencies += client_latencies
+        errors += client_errors
+    for proc in procs:
+        proc.join()
+    return latencies, errors
+
+
+def wait_until_up(url, path, timeout=60):
+    parts = urlsplit(url)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=5)
+            conn.request("GET", path)
+            if conn.getresponse().status == 200:
+                return
+        except (OSError, http.client.HTTPException):
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"{url}{path} did not answer 200 within {timeout}s")
+
+
+def report(label, latencies, errors, duration):
+    if not latencies:
+        print(f"{label:<12} no successful requests ({errors} errors)")
+        return
+    latencies.sort()
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(f"{label:<12} {len(latencies) / duration:9.1f} req/s   "
+          f"p50 {statistics.median(latencies) * 1000:7.1f} ms   p99 {p99 * 1000:7.1f} ms   "
+          f"errors {errors}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="benchmark an already running server instead of starting gunicorn")
+    parser.add_argument("--bind", default="127.0.0.1:8765")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--path", default="/api/posts?limit=20&sort_by=likes")
+    parser.add_argument("--no-cache", action="store_true")
+    args = parser.parse_args()
+
+    if args.url:
+        wait_until_up(args.url, args.path)
+        latencies, errors = run_load(args.url, args.path, args.clients, args.duration)
+        report("server", latencies, errors, args.duration)
+        return
+
+    url = f"http://{args.bind}"
+    for workers in args.workers:
+        env = dict(os.environ, GUNICORN_WORKERS=str(workers), GUNICORN_THREADS=str(args.threads),
+                   GUNICORN_BIND=args.bind)
+        if args.no_cache:
+            env["RESPONSE_CACHE_MAX_ENTRIES"] = "0"
+        server = subprocess.Popen([sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py"],
+                                  cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_until_up(url, args.path)
+            run_load(url, args.path, args.clients, min(args.duration, 3.0))  # warm up
+            latencies, errors = run_load(url, args.path, args.clients, args.duration)
+            report(f"{workers} worker{'s' if workers > 1 else ''}", latencies, errors, args.duration)
+        finally:
+            server.send_signal(signal.SIGTERM)
+            server.wait(timeout=60)
+
+
+if __name__ == "__main__":
+    main()
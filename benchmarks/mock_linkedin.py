@@ -0,0 +1,97 @@
+"""Stand-in for linkedin.com post pages and their media, for import benchmarks.
+
+Serves /feed/update/urn:li:share:<id>/ as a page carrying the caption and
+og:image markup file_handler scrapes, and /media/<id>.jpeg as a small
+image. Both send an ETag and answer 304 to a matching If-None-Match, like
+the real site and CDN. `--latency` adds a per-request delay to stand in
+for the network. Exports pointing at it come from bench_parse.write_exports
+with `base_url` set. Run standalone with:
+
+    python benchmarks/mock_linkedin.py --port 8766 --latency 50
+"""
+import argparse
+import re
+import threading
+import time
+from html import escape
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+POST_PATH = re.compile(r"^/feed/update/urn:li:share:(\d+)/?$")
+MEDIA_PATH = re.compile(r"^/media/(\d+)\.jpeg$")
+
+# A few KB standing in for a post image; its bytes are never decoded
+MEDIA_BYTES = b"\xff\xd8\xff\xe0" + bytes(range(256)) * 16 + b"\xff\xd9"
+
+PAGE = """<!DOCTYPE html>
+<html><head>
+<meta property="og:description" content="{caption}">
+<meta property="og:image" content="{media_url}">
+</head><body>
+<p class="attributed-text-segment-list__content">{caption}</p>
+</body></html>"""
+
+
+class MockLinkedInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    latency = 0.0
+
+    def do_GET(self):
+        if self.latency:
+            time.sleep(self.latency)
+        post = POST_PATH.match(self.path)
+        media = MEDIA_PATH.match(self.path)
+        if post:
+            post_id = post.group(1)
+            media_url = f"http://{self.headers.get('Host')}/media/{post_id}.jpeg"
+            caption = escape(f"Synthetic post {post_id}: five layout mistakes and how grid fixes them")
+            body = PAGE.format(caption=caption, media_url=media_url).encode()
+            self._respond(f'"page-{post_id}"', "text/html; charset=utf-8", body)
+        elif media:
+            self._respond(f'"media-{media.group(1)}"', "image/jpeg", MEDIA_BYTES)
+        else:
+            self.send_error(404)
+
+    def _respond(self, etag, content_type, body):
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start(port=0, latency=0.0):
+    """Serve on a background thread; returns the server and its base URL."""
+    handler = type("Handler", (MockLinkedInHandler,), {"latency": latency})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="mock-linkedin", daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--latency", type=float, default=0.0, help="milliseconds added to every response")
+    args = parser.parse_args()
+
+    server, url = start(args.port, args.latency / 1000)
+    print(f"Serving on {url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
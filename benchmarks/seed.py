@@ -0,0 +1,163 @@
+"""Fill a MySQL database with synthetic posts, topics and topic links.
+
+The database is created if needed, migrated, emptied and filled with
+`--posts` posts spread over three years. Metrics are log-normal, roughly
+like real engagement, and each post gets 1-4 topics drawn from a Zipf-like
+distribution, so a few topics are huge and most are small. Aggregates are
+rebuilt at the end, as `refresh-topic-stats` would. Run from the
+repository root with the app's .env in place:
+
+    python benchmarks/seed.py --posts 100000 --database content_os_bench
+
+The same --seed always produces the same data. The database named in .env
+is refused, so the real data can't be wiped by accident.
+"""
+import argparse
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import mysql.connector  # noqa: E402
+from dotenv import load_dotenv  # noqa: E402
+
+import file_handler  # noqa: E402
+import migrate  # noqa: E402
+import topic_stats  # noqa: E402
+
+FIRST_POST_ID = 7200000000000000000
+START = datetime(2023, 1, 1, 8, 0)
+SPAN = timedelta(days=3 * 365)
+
+VOCABULARY = (
+    "css grid flexbox layout javascript react hooks state performance async python flask "
+    "database index query career interview remote team lead design system accessibility "
+    "animation frontend backend testing debugging deploy docker cloud api rest graphql "
+    "typescript learning beginner roadmap portfolio project freelance client ebook course "
+    "mentor habit productivity burnout hiring resume linkedin growth audience content"
+).split()
+
+TABLES = ("topic_posts", "topics", "posts", "topic_stats", "topic_cooccurrence", "topic_daily_metrics",
+          "post_metric_snapshots")
+
+POST_COLUMNS = ["post_id", "post_url", "caption", "post_datetime"] + file_handler.METRIC_COLUMNS
+
+
+def post_id(index):
+    """Id of the index-th seeded post; seeded ids are contiguous."""
+    return FIRST_POST_ID + index
+
+
+def synthetic_post(rng, index, posts):
+    impressions = int(rng.lognormvariate(8, 1.1))
+    reactions = int(impressions * rng.uniform(0.003, 0.04))
+    clicks = int(impressions * rng.uniform(0, 0.01))
+    metrics = {
+        "likes": reactions,
+        "comments": int(reactions * rng.uniform(0.02, 0.2)),
+        "impressions": impressions,
+        "members_reached": int(impressions * rng.uniform(0.5, 0.9)),
+        "total_clicks": clicks,
+        "main_ebook_clicks": int(clicks * rng.uniform(0, 0.5)),
+        "lead_magnet_clicks": 0,
+        "profile_viewers": int(impressions * rng.uniform(0, 0.005)),
+        "followers_gained": int(impressions * rng.uniform(0, 0.002)),
+        "reactions": reactions,
+        "reposts": int(reactions * rng.uniform(0, 0.05)),
+        "saves": int(reactions * rng.uniform(0, 0.08)),
+        "sends": int(reactions * rng.uniform(0, 0.03)),
+    }
+    posted_at = START + SPAN * (index / posts) + timedelta(minutes=rng.randint(0, 600))
+    caption = " ".join(rng.choices(VOCABULARY, k=rng.randint(15, 80))).capitalize()
+    row = {
+        "post_id": post_id(index),
+        "post_url": f"https://www.linkedin.com/feed/update/urn:li:share:{post_id(index)}/",
+        "caption": caption,
+        "post_datetime": posted_at.replace(second=0, microsecond=0),
+    }
+    row.update(metrics)
+    return [row[column] for column in POST_COLUMNS]
+
+
+def check_target(database):
+    """Call before DB_NAME is overridden; exits if `database` is the app's own."""
+    load_dotenv()
+    if database == os.getenv("DB_NAME"):
+        raise SystemExit(f"Refusing to seed {database}: it is the database in .env")
+
+
+def connect(config, database):
+    """Connection to `database`, creating and migrating it first if needed."""
+    server = mysql.connector.connect(**{**config, "database": None})
+    try:
+        server.cursor().execute(f"CREATE DATABASE IF NOT EXISTS `{database}` "
+                                "CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci")
+    finally:
+        server.close()
+    conn = mysql.connector.connect(**{**config, "database": database})
+    migrate.migrate(conn)
+    return conn
+
+
+def seed(conn, posts, topics=None, seed=0, chunk_size=5000):
+    """Replace the contents of the app's tables with synthetic data.
+
+    Returns the number of topics; their ids are 1..topics.
+    """
+    rng = random.Random(seed)
+    topics = topics or max(50, posts // 200)
+    cursor = conn.cursor()
+    for table in TABLES:
+        cursor.execute(f"TRUNCATE TABLE {table}")
+
+    names = [f"{VOCABULARY[index % len(VOCABULARY)]} {index // len(VOCABULARY) + 1}" for index in range(topics)]
+    cursor.executemany("INSERT INTO topics (name) VALUES (%s)", [(name,) for name in names])
+    conn.commit()
+
+    # Topic k is picked with weight 1/k
+    cum_weights = []
+    total = 0.0
+    for rank in range(1, topics + 1):
+        total += 1 / rank
+        cum_weights.append(total)
+    topic_ids = range(1, topics + 1)
+
+    placeholders = ", ".join(["%s"] * len(POST_COLUMNS))
+    insert_posts = f"INSERT INTO posts ({', '.join(POST_COLUMNS)}) VALUES ({placeholders})"
+    for start in range(0, posts, chunk_size):
+        indexes = range(start, min(start + chunk_size, posts))
+        cursor.executemany(insert_posts, [synthetic_post(rng, index, posts) for index in indexes])
+        links = [
+            (post_id(index), topic_id)
+            for index in indexes
+            for topic_id in set(rng.choices(topic_ids, cum_weights=cum_weights, k=rng.randint(1, 4)))
+        ]
+        cursor.executemany("INSERT INTO topic_posts (post_id, topic_id) VALUES (%s, %s)", links)
+        conn.commit()
+
+    topic_stats.rebuild(conn)
+    return topics
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--posts", type=int, default=10000)
+    parser.add_argument("--topics", type=int, help="defaults to posts / 200, at least 50")
+    parser.add_argument("--database", default="content_os_bench")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    check_target(args.database)
+    config = {"host": os.getenv("DB_HOST"), "user": os.getenv("DB_USER"), "password": os.getenv("DB_PASSWORD")}
+    conn = connect(config, args.database)
+    try:
+        topics = seed(conn, args.posts, args.topics, args.seed)
+    finally:
+        conn.close()
+    print(f"Seeded {args.database}: {args.posts:,} posts, {topics:,} topics")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+import threading
+import time
+from collections import deque
+
+import mysql.connector
+
+
+class PoolTimeoutError(mysql.connector.errors.PoolError):
+    """Raised when no connection could be checked out within the timeout."""
+
+
+class ConnectionPool:
+    """Bounded, thread-safe pool of MySQL connections.
+
+    Idle connections are kept in a LIFO stack so the most recently used (and
+    most likely still alive) connection is handed out first. Every checkout
+    pings the server and transparently replaces connections that were dropped
+    server-side (wait_timeout, restarts, network blips).
+    """
+
+    def __init__(self, db_config, size=10, timeout=5.0, ping_interval=0.0):
+        if size < 1:
+            raise ValueError("Pool size must be at least 1")
+        self.db_config = dict(db_config)
+        self.size = size
+        self.timeout = timeout
+        # Skip the health-check round trip for connections returned less
+        # than ping_interval seconds ago.
+        self.ping_interval = ping_interval
+
+        self._idle = deque()
+        self._in_use = 0
+        self._cond = threading.Condition(threading.Lock())
+        self._closed = False
+
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "waits": 0,
+            "timeouts": 0,
+            "reconnects": 0,
+            "discarded": 0,
+            "wait_time_total": 0.0,
+        }
+
+    def _connect(self):
+        return mysql.connector.connect(**self.db_config)
+
+    def _is_healthy(self, conn, returned_at):
+        if self.ping_interval and time.monotonic() - returned_at < self.ping_interval:
+            return True
+        try:
+            conn.ping(reconnect=False)
+            return True
+        except mysql.connector.Error:
+            return False
+
+    def acquire(self, timeout=None):
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        waited = False
+        wait_started = None
+
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise mysql.connector.errors.PoolError("Connection pool is closed")
+                if self._idle:
+                    conn, returned_at = self._idle.pop()
+                    self._in_use += 1
+                    reuse = True
+                    break
+                if self._in_use < self.size:
+                    self._in_use += 1
+                    conn = None
+                    reuse = False
+                    break
+
+                if not waited:
+                    waited = True
+                    wait_started = time.monotonic()
+                    self._stats["waits"] += 1
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats["timeouts"] += 1
+                    self._stats["wait_time_total"] += time.monotonic() - wait_started
+                    raise PoolTimeoutError(
+                        f"Timed out after {timeout}s waiting for a database connection "
+                        f"(pool size {self.size})"
+                    )
+                self._cond.wait(remaining)
+
+            if waited:
+                self._stats["wait_time_total"] += time.monotonic() - wait_started
+
+        # Network I/O happens outside the lock so a slow connect or ping
+        # never blocks other threads from releasing connections.
+        try:
+            if reuse:
+                if self._is_healthy(conn, returned_at):
+                    self._count("hits")
+                    return conn
+                self._count("reconnects")
+                self._close_quietly(conn)
+            else:
+                self._count("misses")
+            return self._connect()
+        except Exception:
+            with self._cond:
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+    def release(self, conn):
+        keep = False
+        try:
+            if conn.unread_result:
+                conn.consume_results()
+            if conn.in_transaction:
+                conn.rollback()
+            keep = True
+        except mysql.connector.Error:
+            self._count("discarded")
+            self._close_quietly(conn)
+
+        with self._cond:
+            self._in_use -= 1
+            if keep and not self._closed:
+                self._idle.append((conn, time.monotonic()))
+            elif keep:
+                self._close_quietly(conn)
+            self._cond.notify()
+
+    def discard(self, conn):
+        """Drop a checked-out connection instead of returning it to the pool."""
+        self._count("discarded")
+        self._close_quietly(conn)
+        with self._cond:
+            self._in_use -= 1
+            self._cond.notify()
+
+    def close(self, timeout=0.0):
+        """Refuse further checkouts and close every pooled connection.
+
+        Waits up to `timeout` seconds for checked-out connections to be
+        released (they are closed as they come back), so in-flight requests
+        can finish during a graceful shutdown. Returns how many were still
+        checked out when it gave up.
+        """
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._cond.notify_all()
+        for conn, _ in idle:
+            self._close_quietly(conn)
+
+        with self._cond:
+            while self._in_use:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            return self._in_use
+
+    def reset_after_fork(self):
+        """Forget connections inherited from the parent of a forked worker.
+
+        Their sockets are shared with the parent, so they are abandoned
+        rather than closed; closing them would end the parent's sessions.
+        """
+        self._cond = threading.Condition(threading.Lock())
+        self._idle = deque()
+        self._in_use = 0
+        self._closed = False
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._stats)
+            stats["size"] = self.size
+            stats["in_use"] = self._in_use
+            stats["idle"] = len(self._idle)
+        checkouts = stats["hits"] + stats["misses"] + stats["reconnects"]
+        stats["hit_ratio"] = stats["hits"] / checkouts if checkouts else 0.0
+        return stats
+
+    def _count(self, key):
+        with self._cond:
+            self._stats[key] += 1
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
@@ -1,151 +1,323 @@
-import pandas as pd
 from flask import current_app
 from datetime import datetime
-import json
+import csv
+import io
 import requests
+from requests.adapters import HTTPAdapter
 from bs4 import BeautifulSoup
 import re
 import os
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from media_store import MediaStore, MediaTooLargeError
+from scrape_cache import ScrapeCache
+import instrumentation
+
+# Engagement columns produced by handle_files and stored on posts
+METRIC_COLUMNS = [
+    'likes', 'comments', 'impressions', 'members_reached', 'total_clicks',
+    'main_ebook_clicks', 'lead_magnet_clicks', 'profile_viewers',
+    'followers_gained', 'reactions', 'reposts', 'saves', 'sends',
+]
+
+_INT_RE = re.compile(r'-?\d+')
+# Cells pandas used to read as missing, and placeholders that count as zero
+_MISSING_VALUES = frozenset(("", "nan", "none", "n/a", "na", "null", "#n/a"))
+_ZERO_VALUES = _MISSING_VALUES | {"-", "—"}
 
 def _to_int(value):
-    try:
-        if pd.isna(value):
-            return 0
-    except Exception:
-        pass
-    if isinstance(value, (int, float)):
-        try:
-            return int(value)
-        except Exception:
-            return 0
+    if isinstance(value, int):
+        return value
+    if isinstance(value, float):
+        # NaN is the only float not equal to itself
+        return int(value) if value == value and abs(value) != float('inf') else 0
     if isinstance(value, str):
         v = value.strip()
-        if v == "" or v.lower() in ("nan", "none", "n/a", "-", "—"):
+        if v.lower() in _ZERO_VALUES:
             return 0
-        v = v.replace(',', '')
-        m = re.search(r'-?\d+', v)
+        m = _INT_RE.search(v.replace(',', ''))
         return int(m.group()) if m else 0
     return 0
 
-def handle_files(files):
-    if not files:
-        return "No files were uploaded."
+class FileImportError(Exception):
+    """A problem with one uploaded file, worded for the person who uploaded it.
+
+    `retryable` marks transient failures (network errors while scraping)
+    that may succeed if the file is processed again later.
+    """
+
+    def __init__(self, message, retryable=False):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+# Shared HTTP session so concurrent imports reuse TCP/TLS connections to
+# LinkedIn and its media CDN instead of handshaking for every request.
+IMPORT_WORKERS = int(os.getenv("IMPORT_WORKERS", 8))
+_http = requests.Session()
+_http.headers.update({"User-Agent": "Mozilla/5.0"})
+_adapter = HTTPAdapter(pool_connections=4, pool_maxsize=IMPORT_WORKERS)
+_http.mount("https://", _adapter)
+_http.mount("http://", _adapter)
+
+# Relative to this file, not the working directory, so media is written
+# where the /media route serves it from wherever the app is started
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+INSTANCE_DIR = os.path.join(BASE_DIR, 'instance')
+
+# Media files are content-addressed and downloads are skipped for posts
+# whose media is already stored
+media_store = MediaStore(
+    os.getenv("MEDIA_ROOT", os.path.join(BASE_DIR, 'static', 'media')),
+    index_path=os.getenv("MEDIA_INDEX_PATH", os.path.join(INSTANCE_DIR, 'media.sqlite3')),
+    max_bytes=int(os.getenv("MEDIA_MAX_BYTES", 50 * 1024 * 1024)),
+)
+
+# What was scraped for each post, so metric refreshes don't re-scrape LinkedIn
+scrape_cache = ScrapeCache(
+    os.getenv("SCRAPE_CACHE_PATH", os.path.join(INSTANCE_DIR, 'scrape_cache.sqlite3')),
+    ttl=float(os.getenv("SCRAPE_CACHE_TTL", 7 * 24 * 3600)),
+    max_entries=int(os.getenv("SCRAPE_CACHE_MAX_ENTRIES", 50000)),
+)
+
+# Export rows process_file reads; parsing stops once all of them are seen
+EXPORT_KEYS = frozenset((
+    'Post URL', 'Post Date', 'Post Publish Time', 'Reactions', 'Comments',
+    'Impressions', 'Members reached', 'Visits to links in this post',
+    'Profile viewers from this post', 'Followers gained from this post',
+    'Reposts', 'Saves', 'Sends on LinkedIn',
+))
+MAIN_EBOOK_URL = "https://flexicajourney.com/master-flexbox-and-grid"
+
+def _csv_rows(file):
+    text = io.TextIOWrapper(file.stream, encoding='utf-8-sig', newline='')
+    try:
+        for row in csv.reader(text):
+            yield row[:2]
+    finally:
+        # Leave the upload's stream open for its owner
+        text.detach()
+
+def _xlsx_rows(file):
+    from openpyxl import load_workbook  # only XLSX uploads pay for the import
+
+    workbook = load_workbook(file.stream, read_only=True, data_only=True)
+    try:
+        yield from workbook.worksheets[0].iter_rows(max_col=2, values_only=True)
+    finally:
+        workbook.close()
+
+def _read_export(file):
+    """Parse a LinkedIn post analytics export into a {key: value} dict.
+
+    Exports are two columns of key/value rows. Rows are streamed and
+    reading stops as soon as every key in EXPORT_KEYS and the main ebook
+    link have been seen; empty values and `top-*` rows are skipped.
+    """
+    if file.filename.endswith('.csv'):
+        rows = _csv_rows(file)
+    elif file.filename.endswith('.xlsx'):
+        rows = _xlsx_rows(file)
+    else:
+        raise FileImportError(f"Unsupported file type: {file.filename}. Please upload a .csv or .xlsx file.")
+
+    data = {}
+    missing = set(EXPORT_KEYS)
+    ebook_seen = False
+    try:
+        for row in rows:
+            if len(row) < 2:
+                continue
+            key, value = row[0], row[1]
+            if value is None or (isinstance(value, str) and value.strip().lower() in _MISSING_VALUES):
+                continue
+            if isinstance(key, str) and key.startswith('top-'):
+                continue
+            data[key] = value
+            missing.discard(key)
+            if isinstance(key, str) and key.startswith(MAIN_EBOOK_URL):
+                ebook_seen = True
+            if not missing and ebook_seen:
+                break
+    except (csv.Error, UnicodeDecodeError, ValueError, OSError, zipfile.BadZipFile) as e:
+        raise FileImportError(f"Could not read {file.filename}: {e}") from e
+    finally:
+        rows.close()
+    return data
+
+def _extract_post_id(post_url):
+    m = re.search(r'urn:li:(?:share|ugcshare):(\d+)', post_url) or re.search(r'/(\d+)/?', post_url)
+    return m.group(1) if m else None
 
-    for file in files:
+def _scrape_post(post_url, cached=None):
+    """Fetch the public post page and return its caption, og:image URL and validators.
+
+    With a cached entry the request is conditional, and None is returned
+    when the page answers 304 Not Modified.
+    """
+    headers = {}
+    if cached and cached.etag:
+        headers['If-None-Match'] = cached.etag
+    if cached and cached.last_modified:
+        headers['If-Modified-Since'] = cached.last_modified
+
+    resp = _http.get(post_url, headers=headers, timeout=10)
+    if cached and resp.status_code == 304:
+        return None
+    resp.raise_for_status()
+    soup = BeautifulSoup(resp.text, 'lxml')
+
+    caption_tag = soup.find('p', class_='attributed-text-segment-list__content')
+    if caption_tag:
+        caption = caption_tag.get_text(separator='\n', strip=True)
+    else:
+        og_desc = soup.find('meta', property='og:description')
+        caption = og_desc['content'].strip() if og_desc and og_desc.get('content') else None
+
+    media_meta = soup.find('meta', property='og:image')
+    media_url = media_meta['content'] if media_meta and media_meta.get('content') else None
+    return caption, media_url, resp.headers.get('etag'), resp.headers.get('last-modified')
+
+def _fetch_post_content(post_url, post_id, metrics_only=False):
+    """Caption and stored media file for a post, from the scrape cache when possible.
+
+    Fresh entries (and with `metrics_only`, any entry) are used without a
+    request; stale ones are revalidated with a conditional GET.
+    """
+    cached = scrape_cache.get(post_id)
+    if cached and cached.media_file and not os.path.exists(os.path.join(media_store.root, cached.media_file)):
+        cached = None
+    if cached and (metrics_only or scrape_cache.is_fresh(cached)):
+        instrumentation.registry.inc("import_scrape_cache_total", doc="Post pages served by the scrape cache",
+                                     result="hit")
+        return cached.caption, cached.media_file
+
+    with instrumentation.timer("import_scrape_seconds", doc="Time fetching and parsing post pages"):
+        scraped = _scrape_post(post_url, cached)
+    if scraped is None:
+        instrumentation.registry.inc("import_scrape_cache_total", result="revalidated")
+        scrape_cache.touch(post_id)
+        return cached.caption, cached.media_file
+
+    instrumentation.registry.inc("import_scrape_cache_total", result="miss")
+    caption, media_url, etag, last_modified = scraped
+    if media_url:
+        with instrumentation.timer("import_media_seconds", doc="Time fetching post media"):
+            media_url = media_store.fetch(_http, media_url, post_id)
+    scrape_cache.put(post_id, caption, media_url, etag, last_modified)
+    return caption, media_url
+
+def process_file(file, logger, metrics_only=False):
+    """Turn one analytics export into post data, raising FileImportError on bad input."""
+    data = _read_export(file)
+
+    post_url = data.get('Post URL')
+    if not post_url:
+        raise FileImportError(f"'Post URL' not found in the uploaded file {file.filename}.")
+
+    post_id = _extract_post_id(post_url)
+    if not post_id:
+        raise FileImportError(f"Could not extract post ID from URL: {post_url}")
+
+    try:
+        caption, media_url = _fetch_post_content(post_url, post_id, metrics_only)
+    except MediaTooLargeError as e:
+        raise FileImportError(f"Media for post {post_id} is too large: {e}") from e
+    except requests.exceptions.RequestException as e:
+        raise FileImportError(f"Error fetching post data from {post_url}: {e}", retryable=True) from e
+    except Exception as e:
+        raise FileImportError(f"Unexpected error while fetching post data: {e}") from e
+
+    post_date = data.get('Post Date')
+    post_time = data.get('Post Publish Time')
+    post_datetime = None
+    if post_date and post_time:
         try:
-            if file.filename.endswith('.csv'):
-                df = pd.read_csv(file, header=None, names=['key', 'value'])
-            elif file.filename.endswith('.xlsx'):
-                df = pd.read_excel(file, header=None, names=['key', 'value'])
-            else:
-                return f"Unsupported file type: {file.filename}. Please upload a .csv or .xlsx file."
-
-            df.dropna(subset=['value'], inplace=True)
-            df = df[~df['key'].str.startswith('top-', na=False)]
-            data = df.set_index('key')['value'].to_dict()
-
-            post_url = data.get('Post URL')
-            if not post_url:
-                return f"'Post URL' not found in the uploaded file {file.filename}."
-
-            post_id = None
-            m = re.search(r'urn:li:(?:share|ugcshare):(\d+)', post_url) or re.search(r'/(\d+)/?', post_url)
-            if m:
-                post_id = m.group(1)
-            if not post_id:
-                return f"Could not extract post ID from URL: {post_url}"
-
-            caption = None
-            media_url = None
-            try:
-                headers = {"User-Agent": "Mozilla/5.0"}
-                resp = requests.get(post_url, headers=headers, timeout=10)
-                resp.raise_for_status()
-                soup = BeautifulSoup(resp.text, 'lxml')
-
-                caption_tag = soup.find('p', class_='attributed-text-segment-list__content')
-                if caption_tag:
-                    caption = caption_tag.get_text(separator='\n', strip=True)
-                else:
-                    og_desc = soup.find('meta', property='og:description')
-                    caption = og_desc['content'].strip() if og_desc and og_desc.get('content') else None
-
-                media_meta = soup.find('meta', property='og:image')
-                media_url = media_meta['content'] if media_meta and media_meta.get('content') else None
-
-                if media_url and post_id:
-                    media_response = requests.get(media_url, headers=headers, timeout=10)
-                    media_response.raise_for_status()
-
-                    content_type = media_response.headers.get('content-type', '').split(';')[0].lower()
-                    mapping = {
-                        'image/gif': '.gif',
-                        'image/png': '.png',
-                        'image/jpeg': '.jpeg',
-                        'image/jpg': '.jpeg',
-                        'video/mp4': '.mp4',
-                        'image/webp': '.webp'
-                    }
-                    ext = mapping.get(content_type)
-                    if not ext:
-                        ext = os.path.splitext(media_url.split('?')[0])[-1].lower() or '.jpeg'
-                    if not ext.startswith('.'):
-                        ext = '.' + ext
-
-                    save_dir = os.path.join('static', 'media')
-                    os.makedirs(save_dir, exist_ok=True)
-                    save_path = os.path.join(save_dir, f"{post_id}{ext}")
-                    with open(save_path, 'wb') as f:
-                        f.write(media_response.content)
-                    media_url = f"{post_id}{ext}"
-
-            except requests.exceptions.RequestException as e:
-                return f"Error fetching post data from {post_url}: {e}"
-            except Exception as e:
-                return f"Unexpected error while fetching post data: {e}"
-
-            post_date = data.get('Post Date')
-            post_time = data.get('Post Publish Time')
-            post_datetime = None
-            if post_date and post_time:
-                try:
-                    post_datetime = datetime.strptime(f"{post_date} {post_time}", '%b %d, %Y %I:%M %p')
-                except ValueError as e:
-                    return f"Error parsing date/time: {e}"
-            else:
-                return f"'Post Date' or 'Post Publish Time' not found in {file.filename}."
-
-            main_ebook_clicks_key = next(
-                (k for k in data.keys() if isinstance(k, str) and k.startswith("https://flexicajourney.com/master-flexbox-and-grid")),
-                None
-            )
-            main_ebook_clicks = _to_int(data.get(main_ebook_clicks_key, 0)) if main_ebook_clicks_key else 0
-
-            transformed_data = {
-                'post_id': post_id,
-                'post_url': post_url,
-                'media_url': media_url,
-                'caption': caption,
-                'post_datetime': post_datetime.strftime('%Y-%m-%d %H:%M:%S'),
-                'likes': _to_int(data.get('Reactions', 0)),
-                'comments': _to_int(data.get('Comments', 0)),
-                'impressions': _to_int(data.get('Impressions', 0)),
-                'members_reached': _to_int(data.get('Members reached', 0)),
-                'total_clicks': _to_int(data.get('Visits to links in this post', 0)),
-                'main_ebook_clicks': main_ebook_clicks,
-                'lead_magnet_clicks': 0,
-                'profile_viewers': _to_int(data.get('Profile viewers from this post', 0)),
-                'followers_gained': _to_int(data.get('Followers gained from this post', 0)),
-                'reactions': _to_int(data.get('Reactions', 0)),
-                'reposts': _to_int(data.get('Reposts', 0)),
-                'saves': _to_int(data.get('Saves', 0)),
-                'sends': _to_int(data.get('Sends on LinkedIn', 0))
-            }
-
-            current_app.logger.info(json.dumps(transformed_data, indent=2, ensure_ascii=False))
+            post_datetime = datetime.strptime(f"{post_date} {post_time}", '%b %d, %Y %I:%M %p')
+        except ValueError as e:
+            raise FileImportError(f"Error parsing date/time: {e}") from e
+    else:
+        raise FileImportError(f"'Post Date' or 'Post Publish Time' not found in {file.filename}.")
+
+    main_ebook_clicks_key = next(
+        (k for k in data.keys() if isinstance(k, str) and k.startswith(MAIN_EBOOK_URL)),
+        None
+    )
+    main_ebook_clicks = _to_int(data.get(main_ebook_clicks_key, 0)) if main_ebook_clicks_key else 0
 
+    transformed_data = {
+        'post_id': post_id,
+        'post_url': post_url,
+        'media_url': media_url,
+        'caption': caption,
+        'post_datetime': post_datetime.strftime('%Y-%m-%d %H:%M:%S'),
+        'likes': _to_int(data.get('Reactions', 0)),
+        'comments': _to_int(data.get('Comments', 0)),
+        'impressions': _to_int(data.get('Impressions', 0)),
+        'members_reached': _to_int(data.get('Members reached', 0)),
+        'total_clicks': _to_int(data.get('Visits to links in this post', 0)),
+        'main_ebook_clicks': main_ebook_clicks,
+        'lead_magnet_clicks': 0,
+        'profile_viewers': _to_int(data.get('Profile viewers from this post', 0)),
+        'followers_gained': _to_int(data.get('Followers gained from this post', 0)),
+        'reactions': _to_int(data.get('Reactions', 0)),
+        'reposts': _to_int(data.get('Reposts', 0)),
+        'saves': _to_int(data.get('Saves', 0)),
+        'sends': _to_int(data.get('Sends on LinkedIn', 0))
+    }
+
+    # Captions can run to kilobytes; the log gets the numbers only
+    logger.info(f"Parsed export for post {post_id}", extra={
+        'post': {key: value for key, value in transformed_data.items() if key != 'caption'},
+        'caption_chars': len(caption or ''),
+    })
+    return transformed_data
+
+def _import_one(file, logger, metrics_only):
+    filename = getattr(file, 'filename', 'unknown')
+    with instrumentation.timer("import_file_seconds", doc="Time importing one analytics export"):
+        try:
+            return {'filename': filename, 'ok': True, 'data': process_file(file, logger, metrics_only)}
+        except FileImportError as e:
+            return {'filename': filename, 'ok': False, 'error': str(e), 'retryable': e.retryable}
         except Exception as e:
-            current_app.logger.error(f"Error processing file {getattr(file, 'filename', 'unknown')}: {e}")
-            return f"An unexpected error occurred: {e}"
+            logger.error(f"Error processing file {filename}: {e}")
+            return {'filename': filename, 'ok': False, 'error': f"An unexpected error occurred: {e}"}
+
+def import_files(files, max_workers=None, on_result=None, metrics_only=False):
+    """Import every file concurrently, returning one result per file in upload order.
 
+    Each result is {'filename', 'ok', 'data'} or {'filename', 'ok', 'error',
+    'retryable'}; a failing file never stops the others. `on_result(index,
+    result)` is called as each file finishes, for progress reporting. With
+    `metrics_only`, posts already in the scrape cache are not fetched again
+    however old the cached entry is; only their metrics come from the files.
+    """
+    logger = current_app.logger
+    max_workers = min(max_workers or IMPORT_WORKERS, len(files)) or 1
+    results = [None] * len(files)
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="import") as pool:
+        futures = {pool.submit(_import_one, file, logger, metrics_only): index for index, file in enumerate(files)}
+        for future in as_completed(futures):
+            index = futures[future]
+            results[index] = future.result()
+            if on_result:
+                on_result(index, results[index])
+    return results
+
+def single_post_result(results):
+    """Collapse import results the way the /add-post form expects.
+
+    Returns the last file's post data, or the first error message.
+    """
+    transformed_data = None
+    for result in results:
+        if not result['ok']:
+            return result['error']
+        transformed_data = result['data']
     return transformed_data
+
+def handle_files(files):
+    if not files:
+        return "No files were uploaded."
+    return single_post_result(import_files(files))
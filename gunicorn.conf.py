@@ -0,0 +1,58 @@
+"""Production serving config: `gunicorn -c gunicorn.conf.py`.
+
+Each worker is a process with its own DB pool, in-memory indexes and job
+workers; requests inside a worker are served by a thread pool, so a slow
+request only ties up one thread. Every setting can be overridden from the
+environment (GUNICORN_WORKERS, GUNICORN_THREADS, ...).
+"""
+import multiprocessing
+import os
+
+wsgi_app = "app:create_app()"
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+
+# Processes scale across cores; threads cover the time requests spend
+# waiting on MySQL. The job workers that scrape LinkedIn run as background
+# threads inside each process, off the request threads.
+workers = int(os.getenv("GUNICORN_WORKERS", multiprocessing.cpu_count() * 2 + 1))
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", 4))
+
+# One pooled connection per request thread plus one per job worker, so a
+# request never waits on the pool; MySQL's max_connections must cover
+# workers * DB_POOL_SIZE.
+os.environ.setdefault("DB_POOL_SIZE", str(threads + int(os.getenv("JOB_WORKERS", 2))))
+
+# Several processes rotating one file would clobber each other's logs;
+# write to stdout and let the process manager collect it.
+os.environ.setdefault("LOG_FILE", "")
+
+# Import the app and its dependencies once in the master; workers fork
+# with everything already loaded instead of importing it themselves.
+preload_app = True
+
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 30))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", 30))
+keepalive = 5
+
+# Recycle workers now and then to bound memory growth of the in-process caches
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", 10000))
+max_requests_jitter = max_requests // 10
+
+# Per-request latency is in /metrics; set GUNICORN_ACCESS_LOG=- for access lines.
+# Each worker serves its own metrics, labelled with its pid; aggregate
+# with `sum without (pid)` in queries.
+accesslog = os.getenv("GUNICORN_ACCESS_LOG")
+
+
+def post_fork(server, worker):
+    import app
+
+    app.after_fork()
+
+
+def worker_exit(server, worker):
+    import app
+
+    # Leave a margin inside graceful_timeout for the pool and log flush
+    app.shutdown(timeout=max(graceful_timeout - 5, 1))
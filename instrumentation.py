@@ -0,0 +1,293 @@
+import cProfile
+import io
+import logging
+import os
+import pstats
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import g, has_app_context, has_request_context, request
+
+logger = logging.getLogger(__name__)
+
+# Callables invoked with (query, params) for every statement executed
+# through an InstrumentedCursor; used by tools/index_advisor.py
+query_listeners = []
+
+# Seconds; roughly the Prometheus client defaults
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels_text(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+class Registry:
+    """Counters and histograms rendered in the Prometheus text format.
+
+    Series are keyed by metric name plus a sorted label tuple; label values
+    must come from small fixed sets (route rules, statement verbs), never
+    from request data. `add_collector` registers a callable returning
+    (name, type, doc, [(labels, value)]) gauges computed at scrape time.
+
+    Every gunicorn worker keeps its own registry and a scrape reaches
+    whichever worker accepts it, so every sample is rendered with a `pid`
+    label. Each worker's counters then form their own monotonic series;
+    sum them across pids in queries (`sum without (pid) (rate(...))`).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._help = {}
+        self._counters = {}
+        self._histograms = {}
+        self._collectors = []
+
+    def inc(self, name, amount=1, doc="", **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._help.setdefault(name, ("counter", doc))
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, value, doc="", buckets=DEFAULT_BUCKETS, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._help.setdefault(name, ("histogram", doc))
+            series = self._histograms.get(key)
+            if series is None:
+                series = self._histograms[key] = [buckets, [0] * len(buckets), 0, 0.0]
+            for index, bound in enumerate(buckets):
+                if value <= bound:
+                    series[1][index] += 1
+            series[2] += 1
+            series[3] += value
+
+    def add_collector(self, collect):
+        self._collectors.append(collect)
+
+    def render(self):
+        lines = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted((key, (b, list(c), n, s)) for key, (b, c, n, s) in self._histograms.items())
+            kinds = dict(self._help)
+
+        seen = set()
+        pid = (("pid", os.getpid()),)
+
+        def header(name, kind, doc):
+            if name not in seen:
+                seen.add(name)
+                if doc:
+                    lines.append(f"# HELP {name} {doc}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), value in counters:
+            header(name, "counter", kinds[name][1])
+            lines.append(f"{name}{_labels_text(labels + pid)} {value}")
+        for (name, labels), (buckets, counts, count, total) in histograms:
+            header(name, "histogram", kinds[name][1])
+            labels += pid
+            for bound, bucket_count in zip(buckets, counts):
+                lines.append(f"{name}_bucket{_labels_text(labels + (('le', bound),))} {bucket_count}")
+            lines.append(f"{name}_bucket{_labels_text(labels + (('le', '+Inf'),))} {count}")
+            lines.append(f"{name}_count{_labels_text(labels)} {count}")
+            lines.append(f"{name}_sum{_labels_text(labels)} {total}")
+        for collect in self._collectors:
+            try:
+                for name, kind, doc, samples in collect():
+                    header(name, kind, doc)
+                    for labels, value in samples:
+                        lines.append(f"{name}{_labels_text(tuple(sorted(labels.items())) + pid)} {value}")
+            except Exception:
+                logger.exception("Metrics collector failed")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+@contextmanager
+def timer(name, doc="", **labels):
+    """Observe the duration of the block in histogram `name`."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        registry.observe(name, time.perf_counter() - start, doc=doc, **labels)
+
+
+def current_route():
+    if has_request_context():
+        return request.url_rule.rule if request.url_rule else "unmatched"
+    return "background"
+
+
+STATEMENT_VERB = re.compile(r"\s*(\w+)")
+
+
+class InstrumentedCursor:
+    """Cursor proxy recording each statement's duration and the rows it returned."""
+
+    def __init__(self, cursor, slow_query_seconds):
+        self._cursor = cursor
+        self._slow = slow_query_seconds
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        for row in self._cursor:
+            self._count_rows(1)
+            yield row
+
+    def _record(self, query, params, elapsed):
+        match = STATEMENT_VERB.match(query or "")
+        verb = match.group(1).upper() if match else "OTHER"
+        route = current_route()
+        registry.observe("db_query_duration_seconds", elapsed,
+                         doc="Time spent executing SQL statements", route=route, statement=verb)
+        if has_app_context():
+            g.db_queries = g.get("db_queries", 0) + 1
+            g.db_time = g.get("db_time", 0.0) + elapsed
+        if elapsed >= self._slow:
+            logger.warning("Slow query (%.1f ms) on %s: %s", elapsed * 1000, route,
+                           " ".join(str(query).split())[:500])
+        for listener in query_listeners:
+            listener(query, params)
+
+    def _count_rows(self, count):
+        if count:
+            registry.inc("db_rows_returned_total", count, doc="Rows fetched from SQL statements",
+                         route=current_route())
+            if has_app_context():
+                g.db_rows = g.get("db_rows", 0) + count
+
+    def execute(self, query, params=None, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return self._cursor.execute(query, params, *args, **kwargs)
+        finally:
+            self._record(query, params, time.perf_counter() - start)
+
+    def executemany(self, query, seq_params, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return self._cursor.executemany(query, seq_params, *args, **kwargs)
+        finally:
+            self._record(query, None, time.perf_counter() - start)
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        self._count_rows(1 if row is not None else 0)
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        rows = self._cursor.fetchmany(*args, **kwargs)
+        self._count_rows(len(rows))
+        return rows
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        self._count_rows(len(rows))
+        return rows
+
+
+class InstrumentedConnection:
+    """Connection proxy whose cursors are InstrumentedCursors."""
+
+    def __init__(self, conn, slow_query_seconds=0.5):
+        self._conn = conn
+        self._slow = slow_query_seconds
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def cursor(self, *args, **kwargs):
+        return InstrumentedCursor(self._conn.cursor(*args, **kwargs), self._slow)
+
+
+class RequestProfiler:
+    """Runs a sampled fraction of requests under cProfile.
+
+    Off unless `sample_rate` > 0. Only one request is profiled at a time.
+    Each profile is written to `directory` as a .prof file (open it with
+    snakeviz or `python -m pstats`) and its top functions are logged.
+    """
+
+    def __init__(self, sample_rate=0.0, directory="profiles", top=20):
+        self.sample_rate = sample_rate
+        self.directory = directory
+        self.top = top
+        self._busy = threading.Lock()
+
+    def start(self):
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            return None
+        if not self._busy.acquire(blocking=False):
+            return None
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiler (a debugger, say) already owns the hook
+            self._busy.release()
+            return None
+        return profile
+
+    def finish(self, profile, route):
+        try:
+            profile.disable()
+            os.makedirs(self.directory, exist_ok=True)
+            name = re.sub(r"[^A-Za-z0-9]+", "_", route).strip("_") or "root"
+            path = os.path.join(self.directory, f"{time.strftime('%Y%m%d-%H%M%S')}-{name}.prof")
+            profile.dump_stats(path)
+            summary = io.StringIO()
+            pstats.Stats(profile, stream=summary).sort_stats("cumulative").print_stats(self.top)
+            logger.info("Profiled %s -> %s\n%s", route, path, summary.getvalue())
+        finally:
+            self._busy.release()
+
+
+def init_app(app, profiler=None):
+    """Time every request, count its DB round trips and optionally profile it.
+
+    Adds a Server-Timing header (total and DB time) to every response.
+    """
+
+    @app.before_request
+    def start_request_timer():
+        g.request_start = time.perf_counter()
+        g.profile = profiler.start() if profiler else None
+
+    @app.after_request
+    def record_request(response):
+        start = g.get("request_start")
+        if start is None:
+            return response
+        elapsed = time.perf_counter() - start
+        route = current_route()
+        registry.observe("http_request_duration_seconds", elapsed, doc="Request latency",
+                         route=route, method=request.method, status=response.status_code)
+        registry.observe("http_request_db_queries", g.get("db_queries", 0),
+                         doc="SQL statements per request", buckets=COUNT_BUCKETS, route=route)
+        response.headers["Server-Timing"] = (
+            f"app;dur={elapsed * 1000:.1f}, db;dur={g.get('db_time', 0.0) * 1000:.1f};desc=\"{g.get('db_queries', 0)} queries\""
+        )
+        return response
+
+    @app.teardown_request
+    def finish_profile(exc):
+        profile = g.pop("profile", None)
+        if profile is not None:
+            profiler.finish(profile, current_route())
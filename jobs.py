@@ -0,0 +1,309 @@
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from werkzeug.datastructures import FileStorage
+from werkzeug.utils import secure_filename
+
+import file_handler
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    files TEXT NOT NULL,
+    options TEXT NOT NULL DEFAULT '{}',
+    results TEXT NOT NULL,
+    total INTEGER NOT NULL,
+    done INTEGER NOT NULL DEFAULT 0,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    run_after REAL NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_queue ON jobs (status, run_after);
+"""
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+
+
+class JobQueue:
+    """Persistent queue of post-ingestion jobs backed by SQLite.
+
+    Uploads are copied to disk and recorded as a job; a small pool of
+    worker threads claims queued jobs and runs them through
+    file_handler.import_files, writing each file's result back as it
+    finishes so clients can poll progress. Files that failed with a
+    transient (network) error are retried with exponential backoff.
+    Claiming is a single SQLite write transaction, so several processes
+    can share one queue file.
+
+    Bind the Flask app with `init_app` before `start`; the workers run
+    imports inside its app context.
+    """
+
+    def __init__(self, path, upload_dir, workers=2, max_attempts=3, backoff=30.0,
+                 stale_after=900.0, retention=7 * 24 * 3600):
+        self.app = None
+        self.path = path
+        self.upload_dir = upload_dir
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.stale_after = stale_after
+        self.retention = retention
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._threads = []
+        self._start_lock = threading.Lock()
+        self._started = False
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        os.makedirs(upload_dir, exist_ok=True)
+        with self._connect() as db:
+            db.executescript(SCHEMA)
+            columns = {row["name"] for row in db.execute("PRAGMA table_info(jobs)")}
+            if "options" not in columns:
+                # Queue files created before jobs carried options
+                db.execute("ALTER TABLE jobs ADD COLUMN options TEXT NOT NULL DEFAULT '{}'")
+
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            db.row_factory = sqlite3.Row
+            db.execute("PRAGMA journal_mode=WAL")
+            yield db
+        finally:
+            db.close()
+
+    def init_app(self, app):
+        self.app = app
+
+    def enqueue(self, files, metrics_only=False):
+        """Store the uploads and queue them as one job; returns the job id.
+
+        `metrics_only` jobs reuse cached captions and media for posts that
+        were scraped before (see file_handler.import_files).
+        """
+        job_id = uuid.uuid4().hex
+        job_dir = os.path.join(self.upload_dir, job_id)
+        os.makedirs(job_dir)
+
+        stored = []
+        for position, file in enumerate(files):
+            path = os.path.join(job_dir, f"{position}-{secure_filename(file.filename) or 'upload'}")
+            file.save(path)
+            stored.append({"filename": file.filename, "path": path})
+
+        now = time.time()
+        with self._connect() as db:
+            db.execute(
+                "INSERT INTO jobs (id, status, files, options, results, total, run_after, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, QUEUED, json.dumps(stored), json.dumps({"metrics_only": metrics_only}),
+                 json.dumps([None] * len(stored)), len(stored), now, now, now),
+            )
+        self._wakeup.set()
+        return job_id
+
+    def get(self, job_id):
+        with self._connect() as db:
+            row = db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if not row:
+            return None
+        return {
+            "id": row["id"],
+            "status": row["status"],
+            "total": row["total"],
+            "done": row["done"],
+            "attempts": row["attempts"],
+            "results": json.loads(row["results"]),
+        }
+
+    def start(self):
+        """Requeue jobs orphaned by a crashed worker and start the worker threads.
+
+        Runs once per process. Later calls, calls after `stop` and calls
+        with no workers configured return at once, without a lock or a
+        SQLite write, so this is cheap enough for a per-request hook.
+        """
+        if self._started or not self.workers:
+            return
+        with self._start_lock:
+            if self._started:
+                return
+            with self._connect() as db:
+                db.execute(
+                    "UPDATE jobs SET status = ? WHERE status = ? AND updated_at < ?",
+                    (QUEUED, RUNNING, time.time() - self.stale_after),
+                )
+            self._stopping.clear()
+            self._threads = []
+            for index in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f"job-worker-{index}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            self._started = True
+
+    def stop(self, timeout=None):
+        """Stop the workers for good.
+
+        A job still running after `timeout` is requeued once stale, by the
+        next process that starts workers.
+        """
+        self._stopping.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def reset_after_fork(self):
+        """Forget the parent's workers in a forked process, so `start` runs again.
+
+        Threads don't survive fork and the start lock may have been held
+        by one of them when it happened.
+        """
+        self._start_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._wakeup = threading.Event()
+        self._threads = []
+        self._started = False
+
+    def _work(self):
+        last_purge = 0.0
+        while not self._stopping.is_set():
+            try:
+                job = self._claim()
+                if job:
+                    try:
+                        self._run(job)
+                    except Exception as e:
+                        logger.exception(f"Job {job['id']} failed")
+                        self._fail(job, e)
+                    continue
+                if time.time() - last_purge > 3600:
+                    self._purge()
+                    last_purge = time.time()
+            except Exception:
+                logger.exception("Job worker error")
+            self._wakeup.wait(timeout=5)
+            self._wakeup.clear()
+
+    def _claim(self):
+        now = time.time()
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            row = db.execute(
+                "SELECT * FROM jobs WHERE status = ? AND run_after <= ? ORDER BY created_at LIMIT 1",
+                (QUEUED, now),
+            ).fetchone()
+            if row:
+                db.execute(
+                    "UPDATE jobs SET status = ?, attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                    (RUNNING, now, row["id"]),
+                )
+            db.execute("COMMIT")
+        return row
+
+    def _run(self, job):
+        job_id = job["id"]
+        stored = json.loads(job["files"])
+        options = json.loads(job["options"])
+        results = json.loads(job["results"])
+        attempts = job["attempts"] + 1
+
+        # Only files that have not succeeded and may still succeed are (re)run
+        pending = [index for index, result in enumerate(results)
+                   if result is None or (not result["ok"] and result.get("retryable"))]
+        lock = threading.Lock()
+
+        def record(position, result):
+            with lock:
+                results[pending[position]] = result
+                self._save_progress(job_id, results)
+
+        handles = [open(stored[index]["path"], "rb") for index in pending]
+        try:
+            files = [FileStorage(stream=handle, filename=stored[index]["filename"])
+                     for handle, index in zip(handles, pending)]
+            with self.app.app_context():
+                file_handler.import_files(files, on_result=record,
+                                          metrics_only=options.get("metrics_only", False))
+        finally:
+            for handle in handles:
+                handle.close()
+
+        retry = any(not result["ok"] and result.get("retryable") for result in results)
+        if retry and attempts < self.max_attempts:
+            delay = self.backoff * 2 ** (attempts - 1)
+            logger.info(f"Job {job_id} will retry transient failures in {delay:.0f}s")
+            self._finish(job_id, results, QUEUED, run_after=time.time() + delay)
+        else:
+            self._finish(job_id, results, DONE)
+            shutil.rmtree(os.path.join(self.upload_dir, job_id), ignore_errors=True)
+
+    def _fail(self, job, error):
+        """Settle a job whose run raised, so it never stays RUNNING.
+
+        It is requeued with the usual backoff while attempts remain; after
+        that every file without a final result is failed with `error`.
+        """
+        job_id = job["id"]
+        attempts = job["attempts"] + 1
+        with self._connect() as db:
+            row = db.execute("SELECT results FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        results = json.loads(row["results"] if row else job["results"])
+
+        if attempts < self.max_attempts:
+            delay = self.backoff * 2 ** (attempts - 1)
+            logger.info(f"Job {job_id} will be retried in {delay:.0f}s")
+            self._finish(job_id, results, QUEUED, run_after=time.time() + delay)
+            return
+
+        stored = json.loads(job["files"])
+        results = [
+            result if result is not None and (result["ok"] or not result.get("retryable"))
+            else {"filename": stored[index]["filename"], "ok": False,
+                  "error": f"The import could not be run: {error}"}
+            for index, result in enumerate(results)
+        ]
+        self._save_progress(job_id, results)
+        self._finish(job_id, results, DONE)
+        shutil.rmtree(os.path.join(self.upload_dir, job_id), ignore_errors=True)
+
+    def _save_progress(self, job_id, results):
+        done = sum(1 for result in results if result is not None)
+        with self._connect() as db:
+            db.execute(
+                "UPDATE jobs SET results = ?, done = ?, updated_at = ? WHERE id = ?",
+                (json.dumps(results), done, time.time(), job_id),
+            )
+
+    def _finish(self, job_id, results, status, run_after=None):
+        now = time.time()
+        with self._connect() as db:
+            db.execute(
+                "UPDATE jobs SET status = ?, results = ?, run_after = ?, updated_at = ? WHERE id = ?",
+                (status, json.dumps(results), run_after or now, now, job_id),
+            )
+        if status == QUEUED:
+            # Wake a worker once the backoff has passed
+            timer = threading.Timer(run_after - now, self._wakeup.set)
+            timer.daemon = True
+            timer.start()
+
+    def _purge(self):
+        with self._connect() as db:
+            db.execute("DELETE FROM jobs WHERE status = ? AND updated_at < ?",
+                       (DONE, time.time() - self.retention))
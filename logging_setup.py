@@ -0,0 +1,160 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+# Attributes every LogRecord has; anything else was passed through `extra`
+STANDARD_ATTRS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+def _truncate(text, limit):
+    if len(text) <= limit:
+        return text
+    return f"{text[:limit]}... [{len(text) - limit} more chars]"
+
+
+def _cap(value, limit):
+    """Size-cap a value from `extra` while keeping it JSON-serializable."""
+    if isinstance(value, (int, float, bool)) or value is None:
+        return value
+    if isinstance(value, str):
+        return _truncate(value, limit)
+    if isinstance(value, dict):
+        return {str(k): _cap(v, limit) for k, v in list(value.items())[:50]}
+    if isinstance(value, (list, tuple, set)):
+        return [_cap(v, limit) for v in list(value)[:50]]
+    return _truncate(str(value), limit)
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message and any extras.
+
+    String fields longer than `max_field` characters (the message gets
+    `max_message`) are cut, so a stray payload can't bloat the log.
+    """
+
+    def __init__(self, max_field=1000, max_message=4000):
+        super().__init__()
+        self.max_field = max_field
+        self.max_message = max_message
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "msg": _truncate(record.getMessage(), self.max_message),
+        }
+        for key, value in record.__dict__.items():
+            if key not in STANDARD_ATTRS and not key.startswith("_"):
+                entry[key] = _cap(value, self.max_field)
+        if record.exc_info:
+            entry["exc"] = _truncate(self.formatException(record.exc_info), self.max_message * 2)
+        elif record.exc_text:
+            entry["exc"] = _truncate(record.exc_text, self.max_message * 2)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class AccessLogSampler(logging.Filter):
+    """Keep a `rate` fraction of werkzeug's successful access lines.
+
+    Error responses (4xx/5xx) and everything that isn't an access line
+    always pass.
+    """
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        if record.name != "werkzeug" or self.rate >= 1 or record.levelno > logging.INFO:
+            return True
+        args = record.args if isinstance(record.args, tuple) else ()
+        if len(args) >= 2 and str(getattr(args[1], "value", args[1]))[:1] in ("4", "5"):
+            return True
+        return random.random() < self.rate
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler that never blocks: when the writer falls behind, records are dropped and counted.
+
+    The message is interpolated here, on the logging thread, so mutable
+    arguments are captured as they were; all formatting and I/O happens on
+    the listener thread.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def prepare(self, record):
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+
+def dropped_records():
+    """Records discarded so far because the log queue was full."""
+    return sum(handler.dropped for handler in logging.getLogger().handlers
+               if isinstance(handler, DroppingQueueHandler))
+
+
+def setup_logging():
+    """Route all logging through a bounded queue drained by a background writer.
+
+    Configured from the environment: LOG_LEVEL, LOG_FILE (empty disables
+    the file), LOG_MAX_BYTES and LOG_BACKUP_COUNT for rotation,
+    LOG_QUEUE_SIZE, LOG_MAX_FIELD for the per-field size cap, and
+    ACCESS_LOG_SAMPLE_RATE for werkzeug's per-request lines. Returns the
+    started QueueListener; `stop_listener` flushes it.
+    """
+    formatter = JsonFormatter(max_field=int(os.getenv("LOG_MAX_FIELD", 1000)))
+    handlers = []
+    log_file = os.getenv("LOG_FILE", "app.log")
+    if log_file:
+        file_handler = RotatingFileHandler(
+            log_file,
+            maxBytes=int(os.getenv("LOG_MAX_BYTES", 20 * 1024 * 1024)),
+            backupCount=int(os.getenv("LOG_BACKUP_COUNT", 5)),
+            encoding="utf-8",
+        )
+        handlers.append(file_handler)
+    handlers.append(logging.StreamHandler(sys.stdout))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.Queue(maxsize=int(os.getenv("LOG_QUEUE_SIZE", 10000)))
+    queue_handler = DroppingQueueHandler(log_queue)
+    queue_handler.addFilter(AccessLogSampler(float(os.getenv("ACCESS_LOG_SAMPLE_RATE", 0.1))))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(stop_listener, listener)
+    return listener
+
+
+def stop_listener(listener):
+    """Flush and stop a listener; safe to call more than once."""
+    if listener._thread is not None:
+        listener.stop()
@@ -0,0 +1,146 @@
+import glob
+import hashlib
+import os
+import sqlite3
+import tempfile
+import time
+from contextlib import contextmanager
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS media (
+    post_id TEXT PRIMARY KEY,
+    file TEXT NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    fetched_at REAL NOT NULL
+)
+"""
+
+CONTENT_TYPE_EXTENSIONS = {
+    'image/gif': '.gif',
+    'image/png': '.png',
+    'image/jpeg': '.jpeg',
+    'image/jpg': '.jpeg',
+    'video/mp4': '.mp4',
+    'image/webp': '.webp'
+}
+
+CHUNK_SIZE = 64 * 1024
+
+
+class MediaTooLargeError(Exception):
+    pass
+
+
+class MediaStore:
+    """Content-addressed store for post media (static/media by default).
+
+    Downloads are streamed to a temporary file in chunks while being hashed
+    and size-checked, then moved to `<sha256 prefix><ext>`; identical media
+    shared by several posts is stored once. A small SQLite index remembers
+    which file belongs to which post, along with the validators the CDN sent,
+    so re-importing a post either skips the network entirely or costs one
+    conditional request answered with 304.
+    """
+
+    def __init__(self, root, index_path, max_bytes=50 * 1024 * 1024, timeout=10):
+        self.root = root
+        self.index_path = index_path
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        os.makedirs(root, exist_ok=True)
+        os.makedirs(os.path.dirname(index_path) or ".", exist_ok=True)
+        with self._connect() as db:
+            db.execute(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.index_path, timeout=30, isolation_level=None)
+        try:
+            yield db
+        finally:
+            db.close()
+
+    def _lookup(self, post_id):
+        with self._connect() as db:
+            row = db.execute(
+                "SELECT file, etag, last_modified FROM media WHERE post_id = ?", (str(post_id),)
+            ).fetchone()
+        if row and os.path.exists(os.path.join(self.root, row[0])):
+            return row
+        # Media saved before the store existed was named after the post id
+        legacy = glob.glob(os.path.join(glob.escape(self.root), f"{post_id}.*"))
+        if legacy:
+            return os.path.basename(legacy[0]), None, None
+        return None
+
+    def _remember(self, post_id, file, etag=None, last_modified=None):
+        with self._connect() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO media (post_id, file, etag, last_modified, fetched_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (str(post_id), file, etag, last_modified, time.time()),
+            )
+
+    def fetch(self, session, media_url, post_id):
+        """Return the stored file name for a post's media, downloading it if needed."""
+        known = self._lookup(post_id)
+        headers = {}
+        if known:
+            file, etag, last_modified = known
+            if not etag and not last_modified:
+                # Post media never changes in practice; without validators
+                # there is nothing cheaper to ask the CDN than not asking.
+                return file
+            if etag:
+                headers['If-None-Match'] = etag
+            if last_modified:
+                headers['If-Modified-Since'] = last_modified
+
+        with session.get(media_url, headers=headers, timeout=self.timeout, stream=True) as response:
+            if known and response.status_code == 304:
+                return known[0]
+            response.raise_for_status()
+
+            length = response.headers.get('content-length')
+            if length and length.isdigit() and int(length) > self.max_bytes:
+                raise MediaTooLargeError(f"Media is {int(length)} bytes, over the {self.max_bytes} byte limit")
+
+            content_type = response.headers.get('content-type', '').split(';')[0].lower()
+            ext = CONTENT_TYPE_EXTENSIONS.get(content_type)
+            if not ext:
+                ext = os.path.splitext(media_url.split('?')[0])[-1].lower() or '.jpeg'
+            if not ext.startswith('.'):
+                ext = '.' + ext
+
+            file = self._store(response, ext)
+            self._remember(post_id, file, response.headers.get('etag'), response.headers.get('last-modified'))
+            return file
+
+    def _store(self, response, ext):
+        """Stream the body into the store and return its content-addressed file name."""
+        digest = hashlib.sha256()
+        size = 0
+        fd, temp_path = tempfile.mkstemp(dir=self.root, prefix='.download-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in response.iter_content(CHUNK_SIZE):
+                    size += len(chunk)
+                    if size > self.max_bytes:
+                        raise MediaTooLargeError(f"Media exceeds the {self.max_bytes} byte limit")
+                    digest.update(chunk)
+                    f.write(chunk)
+
+            file = digest.hexdigest()[:32] + ext
+            final_path = os.path.join(self.root, file)
+            if os.path.exists(final_path):
+                # Same bytes already stored for another post
+                os.remove(temp_path)
+            else:
+                os.chmod(temp_path, 0o644)
+                os.replace(temp_path, final_path)
+            return file
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
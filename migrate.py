@@ -0,0 +1,63 @@
+import os
+import re
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+
+MIGRATION_FILE = re.compile(r"^(\d+)_[\w-]+\.sql$")
+
+# Creates topic_stats and topic_cooccurrence; `flask migrate` backfills
+# them with topic_stats.rebuild after applying it
+AGGREGATES_MIGRATION = "003_aggregate_tables.sql"
+
+VERSIONS_TABLE = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version VARCHAR(255) NOT NULL PRIMARY KEY,
+    applied_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+
+def available(directory=MIGRATIONS_DIR):
+    """Migration file names in the order they apply (by numeric prefix)."""
+    names = [name for name in os.listdir(directory) if MIGRATION_FILE.match(name)]
+    return sorted(names, key=lambda name: int(MIGRATION_FILE.match(name).group(1)))
+
+
+def split_statements(sql):
+    """Statements of a migration file; `--` comment lines are dropped and `;` ends a statement."""
+    lines = [line for line in sql.splitlines() if not line.strip().startswith("--")]
+    return [statement.strip() for statement in "\n".join(lines).split(";") if statement.strip()]
+
+
+def applied(cursor):
+    cursor.execute(VERSIONS_TABLE)
+    cursor.execute("SELECT version FROM schema_migrations")
+    return {row[0] for row in cursor.fetchall()}
+
+
+def migrate(conn, directory=MIGRATIONS_DIR):
+    """Apply every migration not yet recorded in schema_migrations; returns their names.
+
+    MySQL commits DDL implicitly, so a migration is recorded only after
+    all of its statements ran; one that fails halfway must be finished by
+    hand (or made idempotent) before re-running.
+    """
+    cursor = conn.cursor()
+    done = applied(cursor)
+    ran = []
+    for name in available(directory):
+        if name in done:
+            continue
+        with open(os.path.join(directory, name), encoding="utf-8") as f:
+            statements = split_statements(f.read())
+        for statement in statements:
+            cursor.execute(statement)
+        cursor.execute("INSERT INTO schema_migrations (version) VALUES (%s)", (name,))
+        conn.commit()
+        ran.append(name)
+    return ran
+
+
+def pending(conn, directory=MIGRATIONS_DIR):
+    done = applied(conn.cursor())
+    return [name for name in available(directory) if name not in done]
@@ -0,0 +1,38 @@
+-- Tables the app has always used. IF NOT EXISTS makes this a no-op on
+-- databases created before migrations existed; 002 adds the indexes.
+
+CREATE TABLE IF NOT EXISTS posts (
+    post_id BIGINT UNSIGNED NOT NULL,
+    post_url VARCHAR(512) NOT NULL,
+    media_url VARCHAR(255) NULL,
+    caption TEXT NULL,
+    post_datetime DATETIME NULL,
+    likes INT NOT NULL DEFAULT 0,
+    comments INT NOT NULL DEFAULT 0,
+    impressions INT NOT NULL DEFAULT 0,
+    members_reached INT NOT NULL DEFAULT 0,
+    total_clicks INT NOT NULL DEFAULT 0,
+    main_ebook_clicks INT NOT NULL DEFAULT 0,
+    lead_magnet_clicks INT NOT NULL DEFAULT 0,
+    profile_viewers INT NOT NULL DEFAULT 0,
+    followers_gained INT NOT NULL DEFAULT 0,
+    reactions INT NOT NULL DEFAULT 0,
+    reposts INT NOT NULL DEFAULT 0,
+    saves INT NOT NULL DEFAULT 0,
+    sends INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (post_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Names compare case-insensitively (post_store relies on it)
+CREATE TABLE IF NOT EXISTS topics (
+    id INT UNSIGNED NOT NULL AUTO_INCREMENT,
+    name VARCHAR(255) NOT NULL,
+    PRIMARY KEY (id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- (post_id, topic_id) uniqueness is what INSERT IGNORE in save_posts relies on
+CREATE TABLE IF NOT EXISTS topic_posts (
+    post_id BIGINT UNSIGNED NOT NULL,
+    topic_id INT UNSIGNED NOT NULL,
+    PRIMARY KEY (post_id, topic_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
@@ -0,0 +1,23 @@
+-- Indexes matched to the queries in app.py and post_store.py. InnoDB
+-- secondary indexes end with the primary key, so each (column, post_id)
+-- index also covers the keyset tie-breaker.
+
+-- /posts, /api/posts and /topic/<id>: ORDER BY <column> [DESC], post_id
+-- with keyset conditions, plus the *_min/*_max and date range filters
+ALTER TABLE posts
+    ADD INDEX idx_posts_datetime (post_datetime, post_id),
+    ADD INDEX idx_posts_likes (likes, post_id),
+    ADD INDEX idx_posts_impressions (impressions, post_id),
+    ADD INDEX idx_posts_comments (comments, post_id);
+
+-- save_posts looks topics up by name and relies on duplicates being
+-- rejected (INSERT ... ON DUPLICATE KEY UPDATE). Fails if the table
+-- already holds case-insensitive duplicates; merge those first.
+ALTER TABLE topics
+    ADD UNIQUE INDEX uq_topics_name (name);
+
+-- The primary key serves post -> topics; this serves topic -> posts
+-- (the topic_id filter's subquery and the co-occurrence rebuild) from
+-- the index alone.
+ALTER TABLE topic_posts
+    ADD INDEX idx_topic_posts_topic (topic_id, post_id);
@@ -0,0 +1,44 @@
+-- Aggregates maintained by save_post (topic_stats.py) and metric history
+-- (post_store.py). Earlier versions created these on demand, hence
+-- IF NOT EXISTS. The quantile sketches in topic_stats can't be computed
+-- in SQL, so `flask migrate` runs topic_stats.rebuild after applying
+-- this file to fill both aggregate tables from the existing posts.
+
+-- Row 0 is the global aggregate; metric_sketches is a JSON object of
+-- QuantileSketch dicts keyed by metric
+CREATE TABLE IF NOT EXISTS topic_stats (
+    topic_id INT UNSIGNED NOT NULL,
+    post_count INT NOT NULL DEFAULT 0,
+    last_post_datetime DATETIME NULL,
+    metric_sketches MEDIUMTEXT NOT NULL,
+    PRIMARY KEY (topic_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- fetch_related_topics: WHERE topic_id = ? ORDER BY post_count DESC LIMIT n
+CREATE TABLE IF NOT EXISTS topic_cooccurrence (
+    topic_id INT UNSIGNED NOT NULL,
+    related_topic_id INT UNSIGNED NOT NULL,
+    post_count INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (topic_id, related_topic_id),
+    KEY idx_topic_cooccurrence_rank (topic_id, post_count)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- /api/posts/<id>/timeseries is a range scan of one post_id prefix
+CREATE TABLE IF NOT EXISTS post_metric_snapshots (
+    post_id BIGINT UNSIGNED NOT NULL,
+    captured_at DATETIME NOT NULL,
+    likes INT NULL,
+    comments INT NULL,
+    impressions INT NULL,
+    members_reached INT NULL,
+    total_clicks INT NULL,
+    main_ebook_clicks INT NULL,
+    lead_magnet_clicks INT NULL,
+    profile_viewers INT NULL,
+    followers_gained INT NULL,
+    reactions INT NULL,
+    reposts INT NULL,
+    saves INT NULL,
+    sends INT NULL,
+    PRIMARY KEY (post_id, captured_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
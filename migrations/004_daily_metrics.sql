@@ -0,0 +1,56 @@
+-- Per-day sums behind /api/aggregates, one row per (topic, day) with
+-- topic_id 0 holding every post, as in topic_stats. Kept current by
+-- topic_stats.record_posts; `refresh-topic-stats` rebuilds it. Day, week
+-- and month buckets are GROUP BYs over at most one row per day.
+
+CREATE TABLE IF NOT EXISTS topic_daily_metrics (
+    topic_id INT UNSIGNED NOT NULL,
+    day DATE NOT NULL,
+    post_count INT NOT NULL DEFAULT 0,
+    likes BIGINT NOT NULL DEFAULT 0,
+    comments BIGINT NOT NULL DEFAULT 0,
+    impressions BIGINT NOT NULL DEFAULT 0,
+    members_reached BIGINT NOT NULL DEFAULT 0,
+    total_clicks BIGINT NOT NULL DEFAULT 0,
+    main_ebook_clicks BIGINT NOT NULL DEFAULT 0,
+    lead_magnet_clicks BIGINT NOT NULL DEFAULT 0,
+    profile_viewers BIGINT NOT NULL DEFAULT 0,
+    followers_gained BIGINT NOT NULL DEFAULT 0,
+    reactions BIGINT NOT NULL DEFAULT 0,
+    reposts BIGINT NOT NULL DEFAULT 0,
+    saves BIGINT NOT NULL DEFAULT 0,
+    sends BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (topic_id, day)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Backfill from the posts saved so far
+INSERT INTO topic_daily_metrics
+    (topic_id, day, post_count, likes, comments, impressions,
+     members_reached, total_clicks, main_ebook_clicks,
+     lead_magnet_clicks, profile_viewers, followers_gained, reactions,
+     reposts, saves, sends)
+SELECT 0, DATE(post_datetime), COUNT(*),
+       SUM(likes), SUM(comments), SUM(impressions),
+       SUM(members_reached), SUM(total_clicks), SUM(main_ebook_clicks),
+       SUM(lead_magnet_clicks), SUM(profile_viewers),
+       SUM(followers_gained), SUM(reactions), SUM(reposts), SUM(saves),
+       SUM(sends)
+FROM posts
+WHERE post_datetime IS NOT NULL
+GROUP BY DATE(post_datetime);
+
+INSERT INTO topic_daily_metrics
+    (topic_id, day, post_count, likes, comments, impressions,
+     members_reached, total_clicks, main_ebook_clicks,
+     lead_magnet_clicks, profile_viewers, followers_gained, reactions,
+     reposts, saves, sends)
+SELECT tp.topic_id, DATE(p.post_datetime), COUNT(*),
+       SUM(p.likes), SUM(p.comments), SUM(p.impressions),
+       SUM(p.members_reached), SUM(p.total_clicks),
+       SUM(p.main_ebook_clicks), SUM(p.lead_magnet_clicks),
+       SUM(p.profile_viewers), SUM(p.followers_gained),
+       SUM(p.reactions), SUM(p.reposts), SUM(p.saves), SUM(p.sends)
+FROM topic_posts tp
+JOIN posts p ON p.post_id = tp.post_id
+WHERE p.post_datetime IS NOT NULL
+GROUP BY tp.topic_id, DATE(p.post_datetime);
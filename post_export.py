@@ -0,0 +1,152 @@
+import csv
+import io
+import json
+from datetime import datetime
+
+from file_handler import METRIC_COLUMNS
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:  # optional; only needed for format=parquet/arrow
+    pyarrow = None
+
+EXPORT_COLUMNS = ["post_id", "post_url", "media_url", "caption", "post_datetime"] + METRIC_COLUMNS
+
+# Rows per fetchmany round trip, and per chunk/row group written
+EXPORT_CHUNK_ROWS = 2000
+
+FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+COLUMNAR_FORMATS = ("parquet", "arrow")
+
+
+def parse_columns(value):
+    """Columns requested by ?columns=a,b (all of them when empty); raises ValueError for unknown ones."""
+    columns = [column.strip() for column in (value or "").split(",") if column.strip()]
+    unknown = [column for column in columns if column not in EXPORT_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown columns: {', '.join(unknown)}")
+    return list(dict.fromkeys(columns)) or list(EXPORT_COLUMNS)
+
+
+def check_format(fmt):
+    """Raise ValueError unless `fmt` can be written in this process."""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format: {fmt}; use one of {', '.join(FORMATS)}")
+    if fmt in COLUMNAR_FORMATS and pyarrow is None:
+        raise ValueError(f"format={fmt} needs pyarrow, which is not installed")
+
+
+def _chunks(cursor):
+    while True:
+        rows = cursor.fetchmany(EXPORT_CHUNK_ROWS)
+        if not rows:
+            return
+        yield rows
+
+
+def _text_value(value):
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    return value
+
+
+def _write_csv(cursor, columns):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for rows in _chunks(cursor):
+        writer.writerows([_text_value(value) for value in row] for row in rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def _write_ndjson(cursor, columns):
+    # post_id is a string, as in /api/posts: it exceeds JavaScript's safe integers
+    id_index = columns.index("post_id") if "post_id" in columns else None
+    for rows in _chunks(cursor):
+        lines = []
+        for row in rows:
+            record = dict(zip(columns, (_text_value(value) for value in row)))
+            if id_index is not None:
+                record["post_id"] = str(row[id_index])
+            lines.append(json.dumps(record, ensure_ascii=False, default=str))
+        yield "\n".join(lines) + "\n"
+
+
+class _Sink:
+    """File-like object pyarrow writes into; drained after every chunk."""
+
+    def __init__(self):
+        self.parts = []
+        self.closed = False
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b"".join(self.parts)
+        self.parts = []
+        return data
+
+
+def _arrow_schema(columns):
+    types = {
+        "post_id": pyarrow.uint64(),
+        "post_url": pyarrow.string(),
+        "media_url": pyarrow.string(),
+        "caption": pyarrow.string(),
+        "post_datetime": pyarrow.timestamp("s"),
+    }
+    return pyarrow.schema([(column, types.get(column, pyarrow.int64())) for column in columns])
+
+
+def _write_columnar(cursor, columns, fmt):
+    schema = _arrow_schema(columns)
+    sink = _Sink()
+    if fmt == "parquet":
+        writer = pyarrow.parquet.ParquetWriter(sink, schema, compression="zstd")
+        write = writer.write_table
+        to_chunk = pyarrow.Table.from_arrays
+    else:
+        writer = pyarrow.ipc.new_stream(sink, schema)
+        write = writer.write_batch
+        to_chunk = pyarrow.RecordBatch.from_arrays
+    try:
+        for rows in _chunks(cursor):
+            # Each chunk becomes one row group (parquet) or record batch (arrow)
+            arrays = [pyarrow.array(values, type=field.type) for values, field in zip(zip(*rows), schema)]
+            write(to_chunk(arrays, schema=schema))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def write_rows(cursor, columns, fmt):
+    """Encode the rows of an executed query chunk by chunk.
+
+    Only EXPORT_CHUNK_ROWS rows are held at a time, so with an unbuffered
+    cursor memory does not grow with the size of the result.
+    """
+    if fmt == "csv":
+        return _write_csv(cursor, columns)
+    if fmt == "ndjson":
+        return _write_ndjson(cursor, columns)
+    return _write_columnar(cursor, columns, fmt)
@@ -0,0 +1,210 @@
+from datetime import datetime
+from itertools import groupby
+
+from file_handler import METRIC_COLUMNS
+import topic_stats
+
+# Columns a client may set through /api/save-post; names are interpolated
+# into SQL, so anything else is rejected.
+POST_COLUMNS = ['post_id', 'post_url', 'media_url', 'caption', 'post_datetime'] + METRIC_COLUMNS
+
+
+# Rows per INSERT statement; keeps large refreshes under max_allowed_packet
+CHUNK_SIZE = 500
+
+
+class MissingTagsError(ValueError):
+    """New posts were submitted without tags (only refreshes may omit them)."""
+
+    def __init__(self, post_ids):
+        super().__init__(f"Tags are required for new posts: {', '.join(map(str, post_ids))}")
+        self.post_ids = post_ids
+
+
+def _placeholders(count):
+    return ', '.join(['%s'] * count)
+
+
+def _post_columns(post_data):
+    # media_url is only written when present, as the single-post path always did
+    columns = [key for key in post_data.keys() if key != 'media_url']
+    if post_data.get('media_url'):
+        columns.append('media_url')
+    return tuple(columns)
+
+
+def _chunks(rows):
+    for start in range(0, len(rows), CHUNK_SIZE):
+        yield rows[start:start + CHUNK_SIZE]
+
+
+def unknown_columns(entries):
+    """Field names in the submitted posts that are not post columns."""
+    return sorted({key for post_data, _ in entries for key in post_data} - set(POST_COLUMNS))
+
+
+def _lock_existing(cursor, post_ids):
+    """{post_id: (metrics, topic ids)} for the posts that already exist, locked for update.
+
+    The metrics dict also carries the stored post_datetime and caption,
+    which refreshes never change; the daily rollups are keyed by the former
+    and the search index needs the latter.
+    """
+    placeholders = _placeholders(len(post_ids))
+    cursor.execute(
+        f"SELECT post_id, post_datetime, caption, {', '.join(METRIC_COLUMNS)} FROM posts "
+        f"WHERE post_id IN ({placeholders}) FOR UPDATE",
+        post_ids,
+    )
+    existing = {str(row[0]): ({'post_datetime': row[1], 'caption': row[2], **dict(zip(METRIC_COLUMNS, row[3:]))},
+                              [])
+                for row in cursor.fetchall()}
+    if existing:
+        cursor.execute(
+            f"SELECT post_id, topic_id FROM topic_posts WHERE post_id IN ({_placeholders(len(existing))})",
+            list(existing),
+        )
+        for post_id, topic_id in cursor.fetchall():
+            existing[str(post_id)][1].append(topic_id)
+    return existing
+
+
+def _upsert_posts(cursor, entries):
+    # executemany turns each chunk into a single multi-row INSERT; posts that
+    # already exist only get their metrics (and new media) updated in place
+    by_columns = sorted(((_post_columns(post_data), post_data) for post_data, _ in entries),
+                        key=lambda item: item[0])
+    for columns, group in groupby(by_columns, key=lambda item: item[0]):
+        updates = [column for column in columns if column in METRIC_COLUMNS or column == 'media_url']
+        assignments = ', '.join(f"{column} = VALUES({column})" for column in updates) or "post_id = post_id"
+        rows = [[post_data[column] for column in columns] for _, post_data in group]
+        for chunk in _chunks(rows):
+            cursor.executemany(
+                f"INSERT INTO posts ({', '.join(columns)}) VALUES ({_placeholders(len(columns))}) "
+                f"ON DUPLICATE KEY UPDATE {assignments}",
+                chunk,
+            )
+
+
+def _record_snapshots(cursor, metrics_by_post, captured_at):
+    rows = [[post_id, captured_at] + [metrics.get(metric) for metric in METRIC_COLUMNS]
+            for post_id, metrics in metrics_by_post]
+    columns = ['post_id', 'captured_at'] + METRIC_COLUMNS
+    for chunk in _chunks(rows):
+        cursor.executemany(
+            f"INSERT INTO post_metric_snapshots ({', '.join(columns)}) "
+            f"VALUES ({_placeholders(len(columns))}) "
+            f"ON DUPLICATE KEY UPDATE {', '.join(f'{m} = VALUES({m})' for m in METRIC_COLUMNS)}",
+            chunk,
+        )
+
+
+def _lookup_topics(cursor, names):
+    """[(submitted name, id, stored name)] for the names that match a topic.
+
+    The names are matched by the column's collation, as its unique index
+    does, so a tag differing from a stored name only in case, accents or
+    trailing spaces finds that topic.
+    """
+    submitted = " UNION ALL ".join(["SELECT %s AS name"] * len(names))
+    cursor.execute(
+        f"SELECT x.name, t.id, t.name FROM ({submitted}) x "
+        f"JOIN topics t ON t.name = x.name COLLATE utf8mb4_unicode_ci",
+        names,
+    )
+    return cursor.fetchall()
+
+
+def _resolve_topics(cursor, names):
+    """Map every tag name to a topic id, creating missing topics.
+
+    Returns ({submitted name: id}, [(id, name) of created topics]).
+    """
+    topic_ids = {name: topic_id for name, topic_id, _ in _lookup_topics(cursor, names)}
+
+    missing = [name for name in names if name not in topic_ids]
+    if not missing:
+        return topic_ids, []
+
+    cursor.execute(
+        f"INSERT INTO topics (name) VALUES {', '.join(['(%s)'] * len(missing))} "
+        f"ON DUPLICATE KEY UPDATE name = name",
+        missing,
+    )
+    created = {}
+    for name, topic_id, stored_name in _lookup_topics(cursor, missing):
+        topic_ids[name] = topic_id
+        created[topic_id] = stored_name
+    return topic_ids, list(created.items())
+
+
+def save_posts(cursor, entries, captured_at=None):
+    """Insert new posts and refresh existing ones inside the caller's transaction.
+
+    `entries` is a list of (post_data, tags) with distinct post ids. Posts
+    that already exist have their metric columns updated in place and may
+    come without tags; new tags on them are linked, existing links kept.
+    Every saved post also gets a row in post_metric_snapshots stamped
+    `captured_at` (default: now). Statements are batched across the whole
+    list, one multi-row statement per chunk of CHUNK_SIZE rows.
+
+    Returns ([topic ids per entry, including ones linked before], [(id, name)
+    of created topics], [caption each entry is stored with]); raises
+    MissingTagsError if a new post has no tags.
+    """
+    captured_at = captured_at or datetime.now().replace(microsecond=0)
+    existing = _lock_existing(cursor, [post_data['post_id'] for post_data, _ in entries])
+
+    untagged = [post_data['post_id'] for post_data, tags in entries
+                if not tags and str(post_data['post_id']) not in existing]
+    if untagged:
+        raise MissingTagsError(untagged)
+
+    _upsert_posts(cursor, entries)
+
+    names = list(dict.fromkeys(tag for _, tags in entries for tag in tags))
+    topic_ids, created_topics = _resolve_topics(cursor, names) if names else ({}, [])
+
+    post_topic_ids = []
+    for _, tags in entries:
+        post_topic_ids.append(list(dict.fromkeys(topic_ids[tag] for tag in tags)))
+
+    links = [(post_data['post_id'], topic_id)
+             for (post_data, _), ids in zip(entries, post_topic_ids)
+             for topic_id in ids]
+    for chunk in _chunks(links):
+        cursor.executemany("INSERT IGNORE INTO topic_posts (post_id, topic_id) VALUES (%s, %s)", chunk)
+
+    # A refresh may carry only some metrics; the rest keep their stored values
+    saved = []
+    for (post_data, _), ids in zip(entries, post_topic_ids):
+        previous = existing.get(str(post_data['post_id']))
+        metrics = {metric: post_data[metric] for metric in METRIC_COLUMNS if metric in post_data}
+        if previous:
+            metrics = {**previous[0], **metrics}
+        saved.append((post_data, metrics, ids, previous))
+
+    _record_snapshots(cursor, [(post_data['post_id'], metrics) for post_data, metrics, _, _ in saved],
+                      captured_at)
+
+    # Keep the per-topic aggregates in step with the saved posts
+    topic_stats.record_posts(
+        cursor, [({**post_data, **metrics}, ids, previous) for post_data, metrics, ids, previous in saved]
+    )
+    all_topic_ids = [list(dict.fromkeys((previous[1] if previous else []) + ids))
+                     for _, _, ids, previous in saved]
+    captions = [previous[0]['caption'] if previous else post_data.get('caption')
+                for post_data, _, _, previous in saved]
+    return all_topic_ids, created_topics, captions
+
+
+def fetch_timeseries(cursor, post_id, metrics, since=None):
+    """Snapshots of one post, oldest first; a range scan on the primary key."""
+    query = (f"SELECT captured_at, {', '.join(metrics)} FROM post_metric_snapshots "
+             f"WHERE post_id = %s")
+    params = [post_id]
+    if since:
+        query += " AND captured_at >= %s"
+        params.append(since)
+    cursor.execute(query + " ORDER BY captured_at", params)
+    return cursor.fetchall()
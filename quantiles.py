@@ -0,0 +1,118 @@
+import math
+
+
+class QuantileSketch:
+    """Mergeable quantile sketch with bounded relative error (DDSketch-style).
+
+    Values are counted in logarithmically sized buckets, so any quantile is
+    reported within `relative_accuracy` of the true value while the sketch
+    stays a few hundred buckets wide no matter how many values it has seen.
+    Adding or removing a value is a single bucket update; count, sum, min
+    and max (and so the mean) are exact.
+    """
+
+    def __init__(self, relative_accuracy=0.01):
+        self.relative_accuracy = relative_accuracy
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self.buckets = {}
+        self.zero_count = 0
+        self.count = 0
+        self.sum = 0
+        self.min = None
+        self.max = None
+
+    def _key(self, value):
+        return math.ceil(math.log(value) / self._log_gamma)
+
+    def _value(self, key):
+        return 2 * self._gamma ** key / (self._gamma + 1)
+
+    def add(self, value):
+        if value <= 0:
+            # Engagement counters are never negative; treat them as zero
+            value = 0
+            self.zero_count += 1
+        else:
+            key = self._key(value)
+            self.buckets[key] = self.buckets.get(key, 0) + 1
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def remove(self, value):
+        """Forget one previously added value (used when a post's metrics change).
+
+        min and max are left as they were; they are bounds, not exact
+        extremes, once values have been removed.
+        """
+        if value <= 0:
+            if not self.zero_count:
+                return
+            value = 0
+            self.zero_count -= 1
+        else:
+            key = self._key(value)
+            remaining = self.buckets.get(key, 0) - 1
+            if remaining < 0:
+                return
+            if remaining:
+                self.buckets[key] = remaining
+            else:
+                del self.buckets[key]
+        self.count -= 1
+        self.sum -= value
+        if not self.count:
+            self.min = self.max = None
+
+    def merge(self, other):
+        for key, count in other.buckets.items():
+            self.buckets[key] = self.buckets.get(key, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.sum += other.sum
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+
+    @property
+    def mean(self):
+        return self.sum / self.count if self.count else 0
+
+    def quantile(self, q):
+        if not self.count:
+            return 0
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0
+        for key in sorted(self.buckets):
+            seen += self.buckets[key]
+            if rank < seen:
+                return min(max(self._value(key), self.min), self.max)
+        return self.max
+
+    def to_dict(self):
+        keys = sorted(self.buckets)
+        return {
+            "a": self.relative_accuracy,
+            "n": self.count,
+            "s": self.sum,
+            "lo": self.min,
+            "hi": self.max,
+            "z": self.zero_count,
+            "k": keys,
+            "c": [self.buckets[key] for key in keys],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data["a"])
+        sketch.count = data["n"]
+        sketch.sum = data["s"]
+        sketch.min = data["lo"]
+        sketch.max = data["hi"]
+        sketch.zero_count = data["z"]
+        sketch.buckets = dict(zip(data["k"], data["c"]))
+        return sketch
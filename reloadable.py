@@ -0,0 +1,60 @@
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class ReloadableIndex:
+    """Base for in-process indexes that mirror MySQL tables.
+
+    Subclasses implement `reload(connect)` to rebuild their state from the
+    database. The index is loaded on first use and reloaded once it is older
+    than `max_age` seconds, so writes made by other worker processes
+    eventually show up; writes made by this process should be applied in
+    place by the subclass. Only the first load blocks: a stale index is
+    rebuilt on a background thread while requests keep using the current
+    copy.
+    """
+
+    def __init__(self, max_age=300):
+        self.max_age = max_age
+        self._lock = threading.RLock()
+        self._reload_lock = threading.Lock()
+        self._loaded_at = None
+
+    @property
+    def loaded(self):
+        return self._loaded_at is not None
+
+    def ensure_loaded(self, connect):
+        """Load the index if needed; `connect` is a get_db_connection-style factory."""
+        if self._loaded_at is None:
+            with self._reload_lock:
+                if self._loaded_at is None:
+                    self.reload(connect)
+        elif time.monotonic() - self._loaded_at > self.max_age:
+            # Released by the refresh thread once the new copy is in place
+            if self._reload_lock.acquire(blocking=False):
+                try:
+                    threading.Thread(target=self._refresh, args=(connect,),
+                                     name=f"{type(self).__name__}-reload", daemon=True).start()
+                except RuntimeError:
+                    self._reload_lock.release()
+                    raise
+
+    def _refresh(self, connect):
+        try:
+            self.reload(connect)
+        except Exception:
+            # Keep serving the current copy and try again after max_age
+            logger.exception(f"Reloading {type(self).__name__} failed")
+            self._mark_loaded()
+        finally:
+            self._reload_lock.release()
+
+    def reload(self, connect):
+        raise NotImplementedError
+
+    def _mark_loaded(self):
+        self._loaded_at = time.monotonic()
@@ -0,0 +1,212 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from functools import wraps
+from urllib.parse import urlencode
+
+from flask import Response, current_app, g, request
+
+try:
+    import redis
+except ImportError:  # optional; only needed when REDIS_URL is set
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+REDIS_PREFIX = "content-os:cache:"
+
+
+class LRUBackend:
+    """Entries and tag versions in this process only."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry, ttl):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def versions(self, tags):
+        with self._lock:
+            return [self._versions.get(tag, 0) for tag in tags]
+
+    def bump(self, tags):
+        with self._lock:
+            for tag in tags:
+                self._versions[tag] = self._versions.get(tag, 0) + 1
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class RedisBackend:
+    """Entries and tag versions shared by every process through Redis.
+
+    Entries are stored as a JSON header line followed by the raw body and
+    expire after the cache's ttl; Redis' own maxmemory policy bounds size.
+    """
+
+    def __init__(self, url):
+        self._redis = redis.Redis.from_url(url)
+
+    def get(self, key):
+        value = self._redis.get(REDIS_PREFIX + "entry:" + key)
+        if value is None:
+            return None
+        header, body = value.split(b"\n", 1)
+        return {**json.loads(header), "body": body}
+
+    def set(self, key, entry, ttl):
+        header = json.dumps({k: v for k, v in entry.items() if k != "body"}).encode()
+        self._redis.set(REDIS_PREFIX + "entry:" + key, header + b"\n" + entry["body"], ex=int(ttl))
+
+    def versions(self, tags):
+        if not tags:
+            return []
+        return [int(v or 0) for v in self._redis.mget([REDIS_PREFIX + "tag:" + tag for tag in tags])]
+
+    def bump(self, tags):
+        pipe = self._redis.pipeline(transaction=False)
+        for tag in tags:
+            pipe.incr(REDIS_PREFIX + "tag:" + tag)
+        pipe.execute()
+
+    def __len__(self):
+        return 0
+
+
+class ResponseCache:
+    """Cache of rendered GET responses, invalidated by version tags.
+
+    Each cached view names the tags its output depends on ("posts",
+    "post:<id>", "topic:<id>", "topics"); a view can add tags it only
+    learns while rendering with `depends_on`. An entry remembers the
+    version of every tag at render time and is served only while they are
+    all unchanged, so writers just `bump` the tags they touched once their
+    transaction commits. Entries also expire after `ttl` seconds to pick up
+    changes made outside the app.
+
+    Keys are the path plus the sorted query parameters. Responses carry an
+    ETag and Last-Modified and are revalidated on every view, so a repeat
+    view is a 304 and a cache hit costs neither a query nor a render.
+
+    With `redis_url` entries and versions live in Redis and every worker
+    process sees every bump; otherwise an in-process LRU is used and a bump
+    only reaches the process that made it (others catch up within `ttl`).
+    """
+
+    def __init__(self, max_entries=1024, ttl=300, redis_url=None):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.backend = None
+        if redis_url:
+            if redis is None:
+                logger.warning("REDIS_URL is set but the redis package is not installed; "
+                               "using the in-process response cache")
+            else:
+                self.backend = RedisBackend(redis_url)
+        if self.backend is None:
+            self.backend = LRUBackend(max_entries)
+
+    @staticmethod
+    def _key():
+        # Encoded, so values holding "&" or "=" can't collide with other
+        # queries; empty values are kept (?cursor= changes the response)
+        return request.path + "?" + urlencode(sorted(request.args.items(multi=True)))
+
+    def _valid(self, entry):
+        if time.time() - entry["created"] > self.ttl:
+            return False
+        tags = list(entry["deps"])
+        return self.backend.versions(tags) == [entry["deps"][tag] for tag in tags]
+
+    def depends_on(self, *tags):
+        """Record extra tags for the response being rendered."""
+        deps = g.get("_response_cache_deps")
+        if deps is None:
+            return
+        tags = [tag for tag in tags if tag not in deps]
+        deps.update(zip(tags, self.backend.versions(tags)))
+
+    def bump(self, *tags):
+        """Invalidate every cached response depending on any of `tags`."""
+        tags = list(dict.fromkeys(tags))
+        if tags:
+            self.backend.bump(tags)
+
+    def cached(self, *tags):
+        """Decorator caching a view; tags may use the view's arguments, e.g. "post:{post_id}"."""
+        def decorator(view):
+            @wraps(view)
+            def wrapper(**view_args):
+                key = self._key()
+                entry = self.backend.get(key)
+                if entry is not None and self._valid(entry):
+                    with self._lock:
+                        self.hits += 1
+                    response = Response(entry["body"], status=200, content_type=entry["content_type"])
+                    response.set_etag(entry["etag"])
+                    response.last_modified = datetime.fromtimestamp(entry["created"], timezone.utc)
+                else:
+                    with self._lock:
+                        self.misses += 1
+                    view_tags = [tag.format(**view_args) for tag in tags]
+                    # Versions are read before rendering so a concurrent bump
+                    # leaves the entry already stale rather than wrongly fresh
+                    g._response_cache_deps = dict(zip(view_tags, self.backend.versions(view_tags)))
+                    response = current_app.make_response(view(**view_args))
+                    deps = g.pop("_response_cache_deps")
+                    if response.status_code == 200 and not response.is_streamed:
+                        response = self._store(key, response, deps)
+
+                response.cache_control.no_cache = True
+                return response.make_conditional(request)
+            return wrapper
+        return decorator
+
+    def _store(self, key, response, deps):
+        body = response.get_data()
+        etag, _ = response.get_etag()
+        if not etag:
+            etag = hashlib.sha1(body).hexdigest()
+            response.set_etag(etag)
+        created = time.time()
+        response.last_modified = datetime.fromtimestamp(created, timezone.utc)
+        self.backend.set(key, {
+            "body": body,
+            "content_type": response.content_type,
+            "etag": etag,
+            "created": created,
+            "deps": deps,
+        }, self.ttl)
+        return response
+
+    def stats(self):
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        lookups = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": hits / lookups if lookups else 0.0,
+            "entries": len(self.backend),
+        }
@@ -0,0 +1,89 @@
+import os
+import sqlite3
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scrapes (
+    post_id TEXT PRIMARY KEY,
+    caption TEXT,
+    media_file TEXT,
+    etag TEXT,
+    last_modified TEXT,
+    fetched_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_scrapes_accessed ON scrapes (accessed_at);
+"""
+
+EVICT_EVERY = 100
+
+CachedScrape = namedtuple("CachedScrape", "caption media_file etag last_modified fetched_at")
+
+
+class ScrapeCache:
+    """Persistent cache of what was scraped from each post's LinkedIn page.
+
+    Keyed by post id, it holds the caption and the stored media file name
+    plus the page's HTTP validators. Entries younger than `ttl` seconds are
+    used without touching the network; older ones are revalidated with a
+    conditional request. Once more than `max_entries` posts are cached the
+    least recently used ones are evicted.
+    """
+
+    def __init__(self, path, ttl=7 * 24 * 3600, max_entries=50000):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._puts = 0
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as db:
+            db.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            db.execute("PRAGMA journal_mode=WAL")
+            yield db
+        finally:
+            db.close()
+
+    def get(self, post_id):
+        with self._connect() as db:
+            row = db.execute(
+                "SELECT caption, media_file, etag, last_modified, fetched_at FROM scrapes WHERE post_id = ?",
+                (str(post_id),),
+            ).fetchone()
+            if row:
+                db.execute("UPDATE scrapes SET accessed_at = ? WHERE post_id = ?", (time.time(), str(post_id)))
+        return CachedScrape(*row) if row else None
+
+    def is_fresh(self, entry):
+        return time.time() - entry.fetched_at < self.ttl
+
+    def put(self, post_id, caption, media_file, etag=None, last_modified=None):
+        now = time.time()
+        with self._connect() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO scrapes "
+                "(post_id, caption, media_file, etag, last_modified, fetched_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (str(post_id), caption, media_file, etag, last_modified, now, now),
+            )
+            # Trimming walks the LRU index, so do it every EVICT_EVERY writes
+            self._puts += 1
+            if self._puts % EVICT_EVERY == 0:
+                db.execute(
+                    "DELETE FROM scrapes WHERE post_id IN ("
+                    " SELECT post_id FROM scrapes ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+
+    def touch(self, post_id):
+        """Mark an entry as revalidated (the page answered 304 Not Modified)."""
+        now = time.time()
+        with self._connect() as db:
+            db.execute("UPDATE scrapes SET fetched_at = ?, accessed_at = ? WHERE post_id = ?",
+                       (now, now, str(post_id)))
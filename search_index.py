@@ -0,0 +1,198 @@
+import heapq
+import re
+from bisect import bisect_left, insort
+
+from reloadable import ReloadableIndex
+
+TOKEN_RE = re.compile(r"\w+")
+
+# Field weights; a post whose topic matches ranks above one that merely
+# mentions the word somewhere in a long caption.
+CAPTION = 1
+TOPIC = 2
+POST_ID = 4
+FIELD_WEIGHTS = {CAPTION: 1.0, TOPIC: 3.0, POST_ID: 5.0}
+
+# Upper bound on vocabulary terms a single prefix may expand to, so a one
+# letter query cannot turn into a scan of the whole vocabulary.
+MAX_PREFIX_TERMS = 64
+
+# Candidate sets larger than this are narrowed to their best tiers before
+# per-post scoring; exact ranking of 100k posts is not worth the latency.
+MAX_SCORED_CANDIDATES = 2000
+NARROWED_CANDIDATES_PER_RESULT = 4
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.lower()) if text else []
+
+
+class SearchIndex(ReloadableIndex):
+    """In-process inverted index over post captions, topic names and post ids.
+
+    Postings map each token to {field: set of post_ids}. A sorted vocabulary
+    list gives prefix matching through bisect. Writes made by this process
+    are applied in place by `add_post`; the caption tokens of each post are
+    kept so a changed caption can be taken out of the postings again.
+    """
+
+    def __init__(self, max_age=300, caption_preview=200):
+        super().__init__(max_age)
+        self.caption_preview = caption_preview
+        self._postings = {}
+        self._vocab = []
+        self._captions = {}
+        self._caption_tokens = {}
+
+    def reload(self, connect):
+        with connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT post_id, caption FROM posts")
+            posts = cursor.fetchall()
+            cursor.execute(
+                "SELECT tp.post_id, t.name FROM topic_posts tp "
+                "JOIN topics t ON t.id = tp.topic_id"
+            )
+            topic_links = cursor.fetchall()
+
+        postings = {}
+        captions = {}
+        caption_tokens = {}
+        for post_id, caption in posts:
+            post_id = int(post_id)
+            captions[post_id] = (caption or "")[:self.caption_preview]
+            caption_tokens[post_id] = frozenset(tokenize(caption))
+            self._index_text(postings, post_id, caption, CAPTION)
+            self._index_text(postings, post_id, str(post_id), POST_ID)
+        for post_id, name in topic_links:
+            self._index_text(postings, int(post_id), name, TOPIC)
+
+        with self._lock:
+            self._postings = postings
+            self._vocab = sorted(postings)
+            self._captions = captions
+            self._caption_tokens = caption_tokens
+            self._mark_loaded()
+
+    def add_post(self, post_id, caption, topic_names=()):
+        """Index a newly saved post (or new topics on an existing one).
+
+        A post indexed before keeps its topics; its caption is replaced, so
+        words no longer in it stop matching.
+        """
+        post_id = int(post_id)
+        with self._lock:
+            if not self.loaded:
+                # Nothing to update yet; the first search loads everything.
+                return
+            new_tokens = []
+            if caption is not None:
+                tokens = frozenset(tokenize(caption))
+                self._remove_caption_tokens(post_id, self._caption_tokens.get(post_id, frozenset()) - tokens)
+                self._caption_tokens[post_id] = tokens
+                self._captions[post_id] = caption[:self.caption_preview]
+                new_tokens += self._index_text(self._postings, post_id, caption, CAPTION)
+            new_tokens += self._index_text(self._postings, post_id, str(post_id), POST_ID)
+            for name in topic_names:
+                new_tokens += self._index_text(self._postings, post_id, name, TOPIC)
+            for token in new_tokens:
+                insort(self._vocab, token)
+
+    def _remove_caption_tokens(self, post_id, tokens):
+        """Drop `post_id` from the caption postings of `tokens`; call with the lock held."""
+        for token in tokens:
+            fields = self._postings.get(token)
+            posts = fields.get(CAPTION) if fields else None
+            if not posts:
+                continue
+            posts.discard(post_id)
+            if not posts:
+                del fields[CAPTION]
+            if not fields:
+                del self._postings[token]
+                del self._vocab[bisect_left(self._vocab, token)]
+
+    def search(self, query, limit=10):
+        """Return up to `limit` (post_id, caption) pairs ranked by relevance.
+
+        Every query token must match (as a prefix) a caption word, a topic
+        word or the post id. Exact token matches score above prefix matches
+        and ties go to the newest post.
+        """
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens:
+            return []
+
+        with self._lock:
+            per_token = [self._tiers(token) for token in tokens]
+            matched = [
+                tiers[0][1] if len(tiers) == 1 else set().union(*(posts for _, posts in tiers))
+                for tiers in per_token
+            ]
+            # Intersect starting from the most selective token; set
+            # operations run in C, so this stays cheap for large postings.
+            order = sorted(range(len(tokens)), key=lambda i: len(matched[i]))
+            candidates = matched[order[0]]
+            for i in order[1:]:
+                candidates = candidates & matched[i]
+            if not candidates:
+                return []
+
+            if len(candidates) > MAX_SCORED_CANDIDATES:
+                candidates = self._narrow(per_token[order[0]], candidates, limit)
+
+            scores = dict.fromkeys(candidates, 0.0)
+            for tiers in per_token:
+                best = {}
+                for score, posts in tiers:
+                    for post_id in posts & candidates:
+                        if score > best.get(post_id, 0.0):
+                            best[post_id] = score
+                for post_id, score in best.items():
+                    scores[post_id] += score
+
+            top = heapq.nlargest(limit, scores.items(), key=lambda item: (item[1], item[0]))
+            return [(post_id, self._captions.get(post_id, "")) for post_id, _ in top]
+
+    def _tiers(self, token):
+        """(score, post_id set) pairs for every indexed term `token` prefixes."""
+        tiers = []
+        start = bisect_left(self._vocab, token)
+        for term in self._vocab[start:start + MAX_PREFIX_TERMS]:
+            if not term.startswith(token):
+                break
+            exactness = 1.0 if term == token else 0.5
+            for field, posts in self._postings[term].items():
+                tiers.append((exactness * FIELD_WEIGHTS[field], posts))
+        tiers.sort(key=lambda tier: tier[0], reverse=True)
+        return tiers
+
+    @staticmethod
+    def _narrow(tiers, candidates, limit):
+        """Cut a huge candidate set down to the best-scoring tiers of one token.
+
+        Walks the tiers from the highest score down and keeps whole tiers
+        until enough candidates are collected, then keeps only the newest
+        few of those, so ranking is only computed for posts that can
+        plausibly reach the top `limit`.
+        """
+        kept = set()
+        for _, posts in tiers:
+            kept |= posts & candidates
+            if len(kept) >= limit:
+                break
+        if len(kept) > MAX_SCORED_CANDIDATES:
+            kept = set(heapq.nlargest(limit * NARROWED_CANDIDATES_PER_RESULT, kept))
+        return kept
+
+    @staticmethod
+    def _index_text(postings, post_id, text, field):
+        """Add `text` to `postings`, returning tokens that were not indexed before."""
+        new_tokens = []
+        for token in tokenize(text):
+            fields = postings.get(token)
+            if fields is None:
+                fields = postings[token] = {}
+                new_tokens.append(token)
+            fields.setdefault(field, set()).add(post_id)
+        return new_tokens
@@ -0,0 +1,105 @@
+import heapq
+from bisect import insort
+from datetime import datetime
+
+from reloadable import ReloadableIndex
+
+
+def _as_datetime(value):
+    if value is None or isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(str(value))
+
+
+class SimilarityIndex(ReloadableIndex):
+    """In-memory post/topic incidence for the "similar posts" panel.
+
+    Every post is held as its set of topic ids (a sparse 0/1 topic vector)
+    and every topic as its posts sorted oldest first by post date. A lookup
+    only scores the newest `max_candidates_per_topic` posts of each of the
+    post's topics, so its cost does not grow with the size of big topics;
+    an older post sharing several topics may be missed, which the panel
+    can live with. The last entry of a topic is its newest post, which
+    gives the latest post date across a post's topics without scanning
+    them.
+    """
+
+    def __init__(self, max_age=300, max_candidates_per_topic=500):
+        super().__init__(max_age)
+        self.max_candidates_per_topic = max_candidates_per_topic
+        self._post_topics = {}
+        self._topic_posts = {}
+        self._dates = {}
+
+    def reload(self, connect):
+        with connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT post_id, post_datetime FROM posts")
+            dates = {int(post_id): post_datetime for post_id, post_datetime in cursor.fetchall()}
+            cursor.execute("SELECT post_id, topic_id FROM topic_posts")
+            links = cursor.fetchall()
+
+        post_topics = {}
+        topic_posts = {}
+        for post_id, topic_id in links:
+            post_id, topic_id = int(post_id), int(topic_id)
+            post_topics.setdefault(post_id, set()).add(topic_id)
+            topic_posts.setdefault(topic_id, []).append((dates.get(post_id) or datetime.min, post_id))
+        for posts in topic_posts.values():
+            posts.sort()
+
+        with self._lock:
+            self._post_topics = post_topics
+            self._topic_posts = topic_posts
+            self._dates = dates
+            self._mark_loaded()
+
+    def add_post(self, post_id, post_datetime, topic_ids):
+        """Record a saved post (or new topics on an existing one)."""
+        post_id = int(post_id)
+        with self._lock:
+            if not self.loaded:
+                return
+            post_datetime = _as_datetime(post_datetime) or self._dates.get(post_id)
+            if post_datetime:
+                self._dates[post_id] = post_datetime
+            topics = self._post_topics.setdefault(post_id, set())
+            for topic_id in topic_ids:
+                topic_id = int(topic_id)
+                if topic_id in topics:
+                    continue
+                topics.add(topic_id)
+                insort(self._topic_posts.setdefault(topic_id, []), (post_datetime or datetime.min, post_id))
+
+    def topics(self, post_id):
+        with self._lock:
+            return sorted(self._post_topics.get(int(post_id), ()))
+
+    def similar(self, post_id, limit=10):
+        """Posts sharing topics with `post_id`, plus the newest post across its topics.
+
+        Returns ([(post_id, shared topic count)], (post_datetime, post_id) or
+        None). Posts sharing more topics rank first, then newer posts.
+        """
+        post_id = int(post_id)
+        with self._lock:
+            topics = self._post_topics.get(post_id, ())
+            overlap = self._candidates(topics)
+            overlap.pop(post_id, None)
+
+            dates = self._dates
+            top = heapq.nlargest(
+                limit, overlap.items(),
+                key=lambda item: (item[1], dates.get(item[0]) or datetime.min, item[0]),
+            )
+            newest = [self._topic_posts[t][-1] for t in topics if self._topic_posts.get(t)]
+            latest = max((entry for entry in newest if entry[0] != datetime.min), default=None)
+            return top, latest
+
+    def _candidates(self, topics):
+        """{post_id: shared topic count} over the newest posts of each topic."""
+        overlap = {}
+        for topic_id in topics:
+            for _, other in self._topic_posts.get(topic_id, ())[-self.max_candidates_per_topic:]:
+                overlap[other] = overlap.get(other, 0) + 1
+        return overlap
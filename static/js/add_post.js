@@ -43,3 +43,26 @@ function updateFileInput() {
     });
     fileInput.files = dataTransfer.files;
 }
+
+const jobStatus = document.getElementById('job-status');
+
+function pollJob(jobId) {
+    fetch(`/api/jobs/${jobId}`)
+        .then(res => res.json())
+        .then(job => {
+            document.getElementById('job-progress').textContent = `${job.done}/${job.total}`;
+            if (job.status === 'done') {
+                window.location.href = `/confirm-upload-post?job=${jobId}`;
+            } else {
+                setTimeout(() => pollJob(jobId), 1000);
+            }
+        })
+        .catch(err => {
+            console.error('Error polling import job:', err);
+            setTimeout(() => pollJob(jobId), 3000);
+        });
+}
+
+if (jobStatus) {
+    pollJob(jobStatus.dataset.jobId);
+}
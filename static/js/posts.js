@@ -4,7 +4,8 @@
     const CONFIG = { POSTS_PER_PAGE: 20, SCROLL_THRESHOLD: 100 };
 
     let state = {
-        offset: 0,
+        cursor: '',
+        hasMore: true,
         isLoading: false,
         sortBy: 'post_datetime',
         sortOrder: 'desc',
@@ -40,7 +41,7 @@
         DOM.loading.style.display = 'block';
 
         const params = new URLSearchParams({
-            offset: state.offset,
+            cursor: state.cursor,
             limit: CONFIG.POSTS_PER_PAGE,
             sort_by: state.sortBy,
             sort_order: state.sortOrder,
@@ -49,7 +50,7 @@
 
         return fetch(`/api/posts?${params.toString()}`)
             .then(res => res.json())
-            .then(posts => {
+            .then(({ posts, next_cursor }) => {
                 posts.forEach(post => {
                     const postEl = document.createElement('div');
                     postEl.classList.add('post');
@@ -73,7 +74,8 @@
                     DOM.postsContainer.appendChild(postEl);
                 });
 
-                state.offset += CONFIG.POSTS_PER_PAGE;
+                state.cursor = next_cursor || '';
+                state.hasMore = Boolean(next_cursor);
                 state.isLoading = false;
                 DOM.loading.style.display = 'none';
             })
@@ -84,6 +86,11 @@
             });
     }
 
+    function resetPagination() {
+        state.cursor = '';
+        state.hasMore = true;
+    }
+
     function clearPosts() {
         const posts = DOM.postsContainer.querySelectorAll('.post');
         posts.forEach(p => p.remove());
@@ -96,7 +103,7 @@
             const val = DOM.filterInputs[key].value;
             if (val) state.filters[key] = val;
         }
-        state.offset = 0;
+        resetPagination();
         clearPosts();
         fetchPosts();
         DOM.filterForm.classList.add('hidden');
@@ -105,7 +112,7 @@
     function handleClearFilters() {
         for (const input of Object.values(DOM.filterInputs)) input.value = '';
         state.filters = {};
-        state.offset = 0;
+        resetPagination();
         clearPosts();
         fetchPosts();
         DOM.filterForm.classList.add('hidden');
@@ -115,7 +122,7 @@
         buttonEl.addEventListener('click', () => {
             if (state.sortBy === column) state.sortOrder = state.sortOrder === 'desc' ? 'asc' : 'desc';
             else { state.sortBy = column; state.sortOrder = 'desc'; }
-            state.offset = 0;
+            resetPagination();
             clearPosts();
             fetchPosts();
         });
@@ -136,7 +143,7 @@
 
     function init() {
         window.addEventListener('scroll', () => {
-            if (window.innerHeight + window.scrollY >= document.body.offsetHeight - CONFIG.SCROLL_THRESHOLD && !state.isLoading) {
+            if (window.innerHeight + window.scrollY >= document.body.offsetHeight - CONFIG.SCROLL_THRESHOLD && !state.isLoading && state.hasMore) {
                 fetchPosts();
             }
         });
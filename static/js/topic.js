@@ -0,0 +1,110 @@
+(() => {
+    'use strict';
+
+    const CONFIG = { POSTS_PER_PAGE: 20, SCROLL_THRESHOLD: 100 };
+    const IMAGE_EXTENSIONS = ['jpg', 'jpeg', 'png', 'gif'];
+    const VIDEO_EXTENSIONS = ['mp4', 'webm'];
+
+    const DOM = {
+        postsGrid: document.querySelector('.posts-grid'),
+        loading: document.getElementById('loading')
+    };
+
+    let state = {
+        topicId: null,
+        cursor: '',
+        isLoading: false
+    };
+
+    function createMedia(mediaUrl) {
+        if (!mediaUrl || mediaUrl.startsWith('http')) return null;
+        const extension = mediaUrl.split('.').pop().toLowerCase();
+        const src = `/media/${mediaUrl}`;
+
+        if (IMAGE_EXTENSIONS.includes(extension)) {
+            const img = document.createElement('img');
+            img.src = src;
+            img.alt = 'Post Media';
+            img.classList.add('post-card__media');
+            return img;
+        }
+        if (VIDEO_EXTENSIONS.includes(extension)) {
+            const video = document.createElement('video');
+            video.controls = true;
+            video.classList.add('post-card__media');
+            const source = document.createElement('source');
+            source.src = src;
+            source.type = `video/${extension}`;
+            video.appendChild(source);
+            return video;
+        }
+        return null;
+    }
+
+    function createPostCard(post) {
+        const card = document.createElement('a');
+        card.href = `/post/${post.post_id}`;
+        card.classList.add('post-card');
+
+        const media = createMedia(post.media_url);
+        if (media) card.appendChild(media);
+
+        const caption = document.createElement('div');
+        caption.classList.add('post-card__caption');
+        const captionText = document.createElement('p');
+        captionText.textContent = `${(post.caption || '').slice(0, 150)}...`;
+        caption.appendChild(captionText);
+
+        const stats = document.createElement('div');
+        stats.classList.add('post-card__stats');
+        stats.innerHTML = `
+            <span><i class="fas fa-eye"></i> ${post.impressions}</span>
+            <span><i class="fas fa-heart"></i> ${post.likes}</span>
+            <span><i class="fas fa-comment"></i> ${post.comments}</span>
+        `;
+
+        card.appendChild(caption);
+        card.appendChild(stats);
+        return card;
+    }
+
+    function fetchPosts() {
+        state.isLoading = true;
+        DOM.loading.style.display = 'block';
+
+        const params = new URLSearchParams({
+            topic_id: state.topicId,
+            cursor: state.cursor,
+            limit: CONFIG.POSTS_PER_PAGE
+        });
+
+        return fetch(`/api/posts?${params.toString()}`)
+            .then(res => res.json())
+            .then(({ posts, next_cursor }) => {
+                posts.forEach(post => DOM.postsGrid.appendChild(createPostCard(post)));
+                state.cursor = next_cursor || '';
+                state.isLoading = false;
+                DOM.loading.style.display = 'none';
+            })
+            .catch(err => {
+                console.error('Error fetching posts:', err);
+                state.isLoading = false;
+                DOM.loading.style.display = 'none';
+            });
+    }
+
+    function init() {
+        if (!DOM.postsGrid) return;
+        state.topicId = DOM.postsGrid.dataset.topicId;
+        state.cursor = DOM.postsGrid.dataset.nextCursor;
+
+        window.addEventListener('scroll', () => {
+            if (window.innerHeight + window.scrollY >= document.body.offsetHeight - CONFIG.SCROLL_THRESHOLD && !state.isLoading && state.cursor) {
+                fetchPosts();
+            }
+        });
+    }
+
+    document.addEventListener('DOMContentLoaded', init);
+
+})();
@@ -0,0 +1,70 @@
+"""Keyset cursors for /api/posts: the SQL keyset_condition builds and decode_cursor's checks."""
+import base64
+import json
+import sqlite3
+
+import pytest
+
+for module in ("flask", "flask_cors", "dotenv", "mysql.connector", "requests", "bs4"):
+    pytest.importorskip(module)
+
+import app  # noqa: E402
+
+
+def raw_cursor(payload):
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+
+@pytest.mark.parametrize("sort_order, value, expected", [
+    ("ASC", 40, ("(likes > %s OR (likes = %s AND post_id > %s))", [40, 40, 7])),
+    ("DESC", 40, ("(likes < %s OR (likes = %s AND post_id < %s) OR likes IS NULL)", [40, 40, 7])),
+    ("ASC", None, ("(likes IS NOT NULL OR post_id > %s)", [7])),
+    ("DESC", None, ("(likes IS NULL AND post_id < %s)", [7])),
+])
+def test_keyset_condition(sort_order, value, expected):
+    assert app.keyset_condition("likes", sort_order, value, 7) == expected
+
+
+@pytest.mark.parametrize("sort_order", ["ASC", "DESC"])
+def test_keyset_pages_cover_every_row_once(sort_order):
+    # SQLite sorts NULLs like MySQL: first ascending, last descending
+    db = sqlite3.connect(":memory:")
+    db.execute("CREATE TABLE posts (post_id INTEGER PRIMARY KEY, likes INTEGER)")
+    db.executemany("INSERT INTO posts VALUES (?, ?)",
+                   [(post_id, None if post_id % 3 == 0 else post_id % 4) for post_id in range(1, 31)])
+    order = f"ORDER BY likes {sort_order}, post_id {sort_order}"
+    expected = [row[0] for row in db.execute(f"SELECT post_id FROM posts {order}")]
+
+    seen, last = [], None
+    while True:
+        condition, params = ("1=1", []) if last is None else app.keyset_condition("likes", sort_order, *last)
+        rows = db.execute(f"SELECT post_id, likes FROM posts WHERE {condition.replace('%s', '?')} {order} LIMIT 4",
+                          params).fetchall()
+        if not rows:
+            break
+        seen += [post_id for post_id, _ in rows]
+        last = (rows[-1][1], rows[-1][0])
+    assert seen == expected
+
+
+def test_decode_cursor_round_trips():
+    token = app.encode_cursor("likes", "DESC", {"likes": 40, "post_id": 7200000000000000001})
+    assert app.decode_cursor(token, "likes", "DESC") == (40, 7200000000000000001)
+
+
+@pytest.mark.parametrize("payload", [
+    ["likes", "DESC", [1, 2], "7"],
+    ["likes", "DESC", {"likes": 1}, "7"],
+    ["likes", "DESC", True, "7"],
+    ["likes", "DESC", 1.5, "7"],
+    ["likes", "DESC", 1, ["7"]],
+    ["likes", "DESC", 1],
+])
+def test_decode_cursor_rejects_malformed_values(payload):
+    with pytest.raises(ValueError, match="Malformed cursor"):
+        app.decode_cursor(raw_cursor(payload), "likes", "DESC")
+
+
+def test_decode_cursor_rejects_another_sort_order():
+    with pytest.raises(ValueError, match="does not match"):
+        app.decode_cursor(raw_cursor(["likes", "ASC", 1, "7"]), "likes", "DESC")
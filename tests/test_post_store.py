@@ -0,0 +1,225 @@
+"""save_posts and topic_stats.record_posts against a fake cursor.
+
+The fake answers the SELECTs save_posts issues from in-memory rows and
+records every write, so the tests check the statements a save produces
+without a database.
+"""
+from datetime import datetime
+
+import pytest
+
+# post_store gets METRIC_COLUMNS from file_handler, which imports these
+for module in ("flask", "requests", "bs4"):
+    pytest.importorskip(module)
+
+import post_store  # noqa: E402
+import topic_stats  # noqa: E402
+from file_handler import METRIC_COLUMNS  # noqa: E402
+
+POST_ID = 7200000000000000001
+POSTED_AT = datetime(2024, 3, 5, 9, 30)
+CAPTURED_AT = datetime(2024, 3, 8, 12, 0)
+
+
+class FakeCursor:
+    """Just enough of a MySQL cursor for save_posts.
+
+    `posts` maps post_id to its stored columns, `topics` maps name to id
+    and `links` holds (post_id, topic_id) pairs. Writes only go to
+    `writes`, as (statement, rows), except that new topics get ids.
+    """
+
+    def __init__(self, posts=None, topics=None, links=(), stats=None):
+        self.posts = posts or {}
+        self.topics = topics or {}
+        self.links = set(links)
+        self.stats = stats or {}
+        self.writes = []
+        self._rows = []
+
+    def execute(self, query, params=()):
+        query = " ".join(query.split())
+        params = list(params)
+        if query.startswith("SELECT post_id, post_datetime, caption,"):
+            self._rows = [
+                (post_id, row["post_datetime"], row["caption"], *(row.get(m) for m in METRIC_COLUMNS))
+                for post_id, row in self.posts.items() if post_id in params
+            ]
+        elif query.startswith("SELECT post_id, topic_id FROM topic_posts"):
+            self._rows = sorted(link for link in self.links if str(link[0]) in params)
+        elif query.startswith("SELECT x.name, t.id, t.name"):
+            # The column's collation ignores case
+            stored = {name.lower(): (topic_id, name) for name, topic_id in self.topics.items()}
+            self._rows = [(name, *stored[name.lower()]) for name in params if name.lower() in stored]
+        elif query.startswith("INSERT INTO topics"):
+            for name in params:
+                self.topics.setdefault(name, len(self.topics) + 1)
+        elif query.startswith("SELECT topic_id, metric_sketches FROM topic_stats"):
+            self._rows = [(topic_id, self.stats[topic_id]) for topic_id in params if topic_id in self.stats]
+        else:
+            self.writes.append((query, [params]))
+
+    def executemany(self, query, rows):
+        self.writes.append((" ".join(query.split()), [list(row) for row in rows]))
+
+    def fetchall(self):
+        rows, self._rows = self._rows, []
+        return rows
+
+    def written(self, prefix):
+        """Rows of every write whose statement starts with `prefix`."""
+        return [row for query, rows in self.writes if query.startswith(prefix) for row in rows]
+
+
+def snapshot(cursor):
+    (row,) = cursor.written("INSERT INTO post_metric_snapshots")
+    return dict(zip(["post_id", "captured_at"] + METRIC_COLUMNS, row))
+
+
+def topic_stats_rows(cursor):
+    """{topic_id: (post count delta, sketches)} from the topic_stats upsert."""
+    return {row[0]: (row[1], topic_stats.load_sketches(row[3]))
+            for row in cursor.written("INSERT INTO topic_stats (topic_id, post_count")}
+
+
+def daily_rows(cursor):
+    """{topic_id: {post_count, metric deltas}} from the topic_daily_metrics upsert."""
+    rows = {}
+    for row in cursor.written("INSERT INTO topic_daily_metrics"):
+        assert str(row[1]) == "2024-03-05"
+        rows[row[0]] = dict(zip(["post_count"] + METRIC_COLUMNS, row[2:]))
+    return rows
+
+
+def stored_post(**metrics):
+    return {"post_datetime": POSTED_AT, "caption": "Five grid mistakes", **metrics}
+
+
+def stored_stats(post, topic_ids):
+    """topic_stats rows counting `post` in the global row and `topic_ids`."""
+    stats = {}
+    for topic_id in [topic_stats.GLOBAL_TOPIC_ID] + topic_ids:
+        sketches = topic_stats.new_sketches()
+        topic_stats.add_post_metrics(sketches, post)
+        stats[topic_id] = topic_stats.dump_sketches(sketches)
+    return stats
+
+
+def test_new_post_is_inserted_and_counted():
+    cursor = FakeCursor(topics={"CSS": 1})
+    post_data = {"post_id": POST_ID, "post_url": "https://www.linkedin.com/feed/update/urn:li:share:1/",
+                 "caption": "Five grid mistakes", "post_datetime": POSTED_AT, "likes": 12, "impressions": 900}
+
+    topic_ids, created, captions = post_store.save_posts(cursor, [(post_data, ["css", "Grid"])], CAPTURED_AT)
+
+    assert topic_ids == [[1, 2]]
+    assert created == [(2, "Grid")]
+    assert captions == ["Five grid mistakes"]
+    assert cursor.written("INSERT IGNORE INTO topic_posts") == [[POST_ID, 1], [POST_ID, 2]]
+
+    saved = snapshot(cursor)
+    assert (saved["captured_at"], saved["likes"], saved["impressions"], saved["comments"]) == \
+        (CAPTURED_AT, 12, 900, None)
+
+    stats = topic_stats_rows(cursor)
+    assert sorted(stats) == [topic_stats.GLOBAL_TOPIC_ID, 1, 2]
+    for count, sketches in stats.values():
+        assert count == 1
+        assert (sketches["likes"].count, sketches["likes"].sum) == (1, 12)
+    assert sorted(row[:2] for row in cursor.written("INSERT INTO topic_cooccurrence")) == [[1, 2], [2, 1]]
+
+    daily = daily_rows(cursor)
+    assert sorted(daily) == [topic_stats.GLOBAL_TOPIC_ID, 1, 2]
+    assert daily[1]["post_count"] == 1
+    assert (daily[1]["likes"], daily[1]["impressions"]) == (12, 900)
+
+
+def test_new_post_without_tags_is_rejected():
+    cursor = FakeCursor()
+    with pytest.raises(post_store.MissingTagsError):
+        post_store.save_posts(cursor, [({"post_id": POST_ID, "likes": 1}, [])], CAPTURED_AT)
+    assert cursor.writes == []
+
+
+def test_refresh_with_partial_metrics_keeps_stored_values():
+    stored = stored_post(likes=10, impressions=500, comments=2)
+    cursor = FakeCursor(posts={POST_ID: stored}, topics={"CSS": 1}, links=[(POST_ID, 1)],
+                        stats=stored_stats(stored, [1]))
+
+    topic_ids, created, captions = post_store.save_posts(
+        cursor, [({"post_id": POST_ID, "likes": 15}, [])], CAPTURED_AT)
+
+    assert (topic_ids, created, captions) == ([[1]], [], ["Five grid mistakes"])
+    (upsert,) = [query for query, _ in cursor.writes if query.startswith("INSERT INTO posts")]
+    assert upsert.endswith("ON DUPLICATE KEY UPDATE likes = VALUES(likes)")
+    assert cursor.written("INSERT IGNORE INTO topic_posts") == []
+
+    saved = snapshot(cursor)
+    assert (saved["likes"], saved["impressions"], saved["comments"]) == (15, 500, 2)
+
+    # The post is already counted: only its likes value is swapped
+    stats = topic_stats_rows(cursor)
+    assert sorted(stats) == [topic_stats.GLOBAL_TOPIC_ID, 1]
+    for count, sketches in stats.values():
+        assert count == 0
+        assert (sketches["likes"].count, sketches["likes"].sum) == (1, 15)
+        assert (sketches["impressions"].count, sketches["impressions"].sum) == (1, 500)
+
+    daily = daily_rows(cursor)
+    assert sorted(daily) == [topic_stats.GLOBAL_TOPIC_ID, 1]
+    assert {key: value for key, value in daily[1].items() if value} == {"likes": 5}
+
+
+def test_refresh_adding_a_tag_counts_the_post_in_the_new_topic_only():
+    stored = stored_post(likes=10, impressions=500)
+    cursor = FakeCursor(posts={POST_ID: stored}, topics={"CSS": 1}, links=[(POST_ID, 1)],
+                        stats=stored_stats(stored, [1]))
+
+    topic_ids, created, _ = post_store.save_posts(
+        cursor, [({"post_id": POST_ID, "likes": 10}, ["Grid"])], CAPTURED_AT)
+
+    assert topic_ids == [[1, 2]]
+    assert created == [(2, "Grid")]
+    assert cursor.written("INSERT IGNORE INTO topic_posts") == [[POST_ID, 2]]
+
+    stats = topic_stats_rows(cursor)
+    assert {topic_id: count for topic_id, (count, _) in stats.items()} == \
+        {topic_stats.GLOBAL_TOPIC_ID: 0, 1: 0, 2: 1}
+    for _, sketches in stats.values():
+        assert (sketches["likes"].count, sketches["likes"].sum) == (1, 10)
+    assert sorted(row for row in cursor.written("INSERT INTO topic_cooccurrence")) == [[1, 2, 1], [2, 1, 1]]
+
+    # Unchanged metrics leave the existing topics' days alone
+    daily = daily_rows(cursor)
+    assert list(daily) == [2]
+    assert (daily[2]["post_count"], daily[2]["likes"], daily[2]["impressions"]) == (1, 10, 500)
+
+
+def test_first_tags_on_an_existing_untagged_post_leave_the_global_count_alone():
+    stored = stored_post(likes=10, impressions=500)
+    cursor = FakeCursor(posts={POST_ID: stored}, stats=stored_stats(stored, []))
+
+    post_store.save_posts(cursor, [({"post_id": POST_ID, "likes": 10}, ["CSS"])], CAPTURED_AT)
+
+    stats = topic_stats_rows(cursor)
+    assert {topic_id: count for topic_id, (count, _) in stats.items()} == {topic_stats.GLOBAL_TOPIC_ID: 0, 1: 1}
+    for _, sketches in stats.values():
+        assert (sketches["likes"].count, sketches["likes"].sum) == (1, 10)
+    assert list(daily_rows(cursor)) == [1]
+
+
+def test_refresh_of_an_untagged_post_updates_the_global_row():
+    stored = stored_post(likes=10, impressions=500)
+    cursor = FakeCursor(posts={POST_ID: stored}, stats=stored_stats(stored, []))
+
+    post_store.save_posts(cursor, [({"post_id": POST_ID, "likes": 25}, [])], CAPTURED_AT)
+
+    stats = topic_stats_rows(cursor)
+    assert list(stats) == [topic_stats.GLOBAL_TOPIC_ID]
+    count, sketches = stats[topic_stats.GLOBAL_TOPIC_ID]
+    assert count == 0
+    assert (sketches["likes"].count, sketches["likes"].sum) == (1, 25)
+
+    daily = daily_rows(cursor)
+    assert list(daily) == [topic_stats.GLOBAL_TOPIC_ID]
+    assert {key: value for key, value in daily[topic_stats.GLOBAL_TOPIC_ID].items() if value} == {"likes": 15}
@@ -0,0 +1,35 @@
+import threading
+
+from reloadable import ReloadableIndex
+
+
+class BlockingIndex(ReloadableIndex):
+    """Counts reloads; every reload after the first waits for `release`."""
+
+    def __init__(self):
+        super().__init__(max_age=0)
+        self.reloads = 0
+        self.release = threading.Event()
+        self.done = threading.Event()
+
+    def reload(self, connect):
+        if self.reloads:
+            assert self.release.wait(5)
+        self.reloads += 1
+        self._mark_loaded()
+        self.done.set()
+
+
+def test_stale_index_is_reloaded_without_blocking_the_caller():
+    index = BlockingIndex()
+    index.ensure_loaded(None)
+    assert index.reloads == 1
+
+    index.done.clear()
+    index.ensure_loaded(None)  # returns while the reload is waiting
+    index.ensure_loaded(None)  # a reload is already running
+    assert index.reloads == 1
+
+    index.release.set()
+    assert index.done.wait(5)
+    assert index.reloads == 2
@@ -0,0 +1,60 @@
+from datetime import datetime, timedelta
+
+from similarity_index import SimilarityIndex
+
+START = datetime(2024, 1, 1)
+
+
+class FakeConnection:
+    """Serves the two SELECTs SimilarityIndex.reload issues."""
+
+    def __init__(self, dates, links):
+        self.rows = {"posts": list(dates.items()), "topic_posts": links}
+        self._result = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def cursor(self):
+        return self
+
+    def execute(self, query):
+        self._result = self.rows[query.split()[-1]]
+
+    def fetchall(self):
+        return self._result
+
+
+def loaded_index(dates, links, **kwargs):
+    index = SimilarityIndex(**kwargs)
+    index.reload(lambda: FakeConnection(dates, links))
+    return index
+
+
+def test_lookup_scores_only_the_newest_posts_of_each_topic():
+    # Topic 1 is huge; topic 2 is small
+    posts = 5000
+    dates = {post_id: START + timedelta(hours=post_id) for post_id in range(1, posts + 1)}
+    links = [(post_id, 1) for post_id in dates] + [(post_id, 2) for post_id in (10, 20, 4999)]
+    index = loaded_index(dates, links, max_candidates_per_topic=50)
+
+    assert len(index._candidates(index.topics(10))) <= 50 + 3
+
+    similar, latest = index.similar(10, limit=3)
+    # 4999 shares both topics; then the newest posts of the big topic
+    assert similar == [(4999, 2), (5000, 1), (4998, 1)]
+    assert latest == (dates[5000], 5000)
+
+
+def test_added_posts_stay_in_recency_order():
+    dates = {1: START, 2: START + timedelta(days=1)}
+    index = loaded_index(dates, [(1, 1), (2, 1)], max_candidates_per_topic=2)
+
+    index.add_post(3, START + timedelta(days=2), [1])
+    index.add_post(3, None, [1])
+
+    assert index._candidates([1]) == {2: 1, 3: 1}
+    assert index.similar(1) == ([(3, 1), (2, 1)], (START + timedelta(days=2), 3))
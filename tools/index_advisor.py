@@ -0,0 +1,196 @@
+"""EXPLAIN every query the app issues and flag full scans and filesorts.
+
+Drives the read endpoints through Flask's test client (with sample ids
+taken from the database, every sort column and filter, and both
+pagination modes), runs the save path inside a transaction that is rolled
+back, and collects each distinct SELECT on the way. Each one is then
+EXPLAINed with the parameters it ran with. Needs the app's .env pointing
+at a migrated (`flask --app app migrate`) MySQL/MariaDB database seeded
+with a realistic number of posts. Run from the repository root:
+
+    python tools/index_advisor.py
+    python tools/index_advisor.py --min-rows 500 --verbose
+
+Exits 1 when something is flagged. The in-memory indexes are loaded
+before capturing starts: their reloads read whole tables on purpose.
+"""
+import argparse
+import os
+import sys
+from urllib.parse import quote, urlencode
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Every request must reach MySQL, and nothing should run in the background
+os.environ["RESPONSE_CACHE_MAX_ENTRIES"] = "0"
+os.environ.setdefault("JOB_WORKERS", "0")
+os.environ.setdefault("LOG_FILE", "")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+import app as content_app  # noqa: E402
+import instrumentation  # noqa: E402
+import post_store  # noqa: E402
+
+# A post id no real post uses; only inserted inside the rolled-back transaction
+PROBE_POST_ID = 1
+
+
+def sample_values(cursor):
+    """Ids and names the endpoints are exercised with: the newest post and the biggest topic."""
+    cursor.execute("SELECT post_id, post_datetime FROM posts ORDER BY post_datetime DESC, post_id DESC LIMIT 1")
+    post = cursor.fetchone()
+    cursor.execute("SELECT topic_id, COUNT(*) FROM topic_posts GROUP BY topic_id ORDER BY COUNT(*) DESC LIMIT 1")
+    topic = cursor.fetchone()
+    if post is None or topic is None:
+        raise SystemExit("The database has no posts or topic links; seed it first")
+    cursor.execute("SELECT name FROM topics WHERE id = %s", (topic[0],))
+    return {"post_id": post[0], "post_datetime": post[1], "topic_id": topic[0], "topic_name": cursor.fetchone()[0]}
+
+
+def read_requests(sample):
+    """(label, path) for every read query shape the app can produce."""
+    date_from = sample["post_datetime"].strftime("%Y-%m-%d")
+    filters = [
+        {},
+        {"likes_min": 10},
+        {"impressions_min": 1000, "impressions_max": 100000},
+        {"comments_min": 1},
+        {"date_from": date_from},
+        {"topic_id": sample["topic_id"]},
+        {"topic_id": sample["topic_id"], "likes_min": 10},
+    ]
+    paths = [("posts page", "/posts")]
+    for sort_by in content_app.VALID_SORT_COLUMNS:
+        for args in filters:
+            query = dict(args, sort_by=sort_by, sort_order="desc", limit=20)
+            paths.append((f"/api/posts offset sort={sort_by}", f"/api/posts?{urlencode(dict(query, offset=40))}"))
+            paths.append((f"/api/posts keyset sort={sort_by}", f"/api/posts?{urlencode(dict(query, cursor=''))}"))
+    post_id, topic_id = sample["post_id"], sample["topic_id"]
+    paths += [
+        ("post detail", f"/post/{post_id}"),
+        ("topic detail", f"/topic/{topic_id}"),
+        ("topic list", "/api/topics"),
+        ("topic stats", f"/api/topics/{topic_id}/stats"),
+        ("global stats", "/api/stats"),
+        ("aggregates", f"/api/aggregates?bucket=week&date_from={date_from}"),
+        ("topic aggregates", f"/api/aggregates?bucket=month&topic_id={topic_id}"),
+        ("search suggestions", f"/api/search-suggestions?{urlencode({'query': sample['topic_name'][:3]})}"),
+        ("timeseries", f"/api/posts/{post_id}/timeseries?since={date_from}"),
+    ]
+    return paths
+
+
+def exercise_reads(client, sample, record):
+    for label, path in read_requests(sample):
+        record.label = label
+        response = client.get(path)
+        if response.status_code != 200:
+            print(f"warning: {path} answered {response.status_code}", file=sys.stderr)
+            continue
+        # Follow one keyset cursor so the "after this row" condition is
+        # covered too; keyset paths end in "cursor="
+        body = response.get_json(silent=True)
+        if isinstance(body, dict) and body.get("next_cursor"):
+            client.get(path + quote(body["next_cursor"]))
+
+
+def exercise_writes(sample, record):
+    """Save an existing and a new post inside a transaction that is rolled back."""
+    record.label = "save posts"
+    entries = [
+        ({"post_id": sample["post_id"], "likes": 1}, []),
+        ({"post_id": PROBE_POST_ID, "post_url": "https://www.linkedin.com/feed/update/urn:li:share:1/",
+          "post_datetime": sample["post_datetime"], "caption": "index advisor probe"},
+         [sample["topic_name"], "index advisor probe topic"]),
+    ]
+    with content_app.get_db_connection() as conn:
+        cursor = conn.cursor()
+        conn.start_transaction()
+        try:
+            post_store.save_posts(cursor, entries)
+        finally:
+            conn.rollback()
+
+
+class QueryRecorder:
+    """Query listener keeping the first (label, params) of each distinct SELECT."""
+
+    def __init__(self):
+        self.label = None
+        self.queries = {}
+
+    def __call__(self, query, params):
+        text = " ".join(str(query).split())
+        if text.upper().startswith("SELECT") and text not in self.queries:
+            self.queries[text] = (self.label, params)
+
+
+def problems(plan, min_rows):
+    """Reasons an EXPLAIN plan (list of row dicts) needs an index."""
+    found = []
+    for row in plan:
+        table = row.get("table")
+        access = (row.get("type") or "").upper()
+        rows = int(row.get("rows") or 0)
+        extra = row.get("Extra") or ""
+        if access == "ALL" and rows >= min_rows:
+            found.append(f"full table scan of {table} (~{rows} rows)")
+        elif access == "INDEX" and rows >= min_rows:
+            found.append(f"full index scan of {table} (~{rows} rows)")
+        if "Using filesort" in extra:
+            found.append(f"filesort on {table}")
+        if "Using temporary" in extra:
+            found.append(f"temporary table for {table}")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--min-rows", type=int, default=1000,
+                        help="scans estimated below this many rows are not flagged")
+    parser.add_argument("--verbose", action="store_true", help="print the plan of every query, not only flagged ones")
+    args = parser.parse_args()
+
+    flask_app = content_app.create_app()
+    for index in (content_app.post_search_index, content_app.topic_index, content_app.similarity_index):
+        index.ensure_loaded(content_app.get_db_connection)
+
+    with content_app.get_db_connection() as conn:
+        sample = sample_values(conn.cursor())
+
+    record = QueryRecorder()
+    instrumentation.query_listeners.append(record)
+    try:
+        exercise_reads(flask_app.test_client(), sample, record)
+        exercise_writes(sample, record)
+    finally:
+        instrumentation.query_listeners.remove(record)
+
+    flagged = 0
+    # A plain connection, so the EXPLAINs themselves aren't recorded as app queries
+    conn = content_app.db_connection_pool.acquire()
+    try:
+        cursor = conn.cursor(dictionary=True)
+        for query, (label, params) in record.queries.items():
+            cursor.execute(f"EXPLAIN {query}", params)
+            plan = cursor.fetchall()
+            found = problems(plan, args.min_rows)
+            flagged += bool(found)
+            if found or args.verbose:
+                print(f"[{'FLAG' if found else 'ok'}] {label}: {query}")
+                for reason in found:
+                    print(f"    - {reason}")
+                for row in plan:
+                    print(f"    {row.get('table')}: type={row.get('type')} key={row.get('key')} "
+                          f"rows={row.get('rows')} extra={row.get('Extra')}")
+    finally:
+        content_app.db_connection_pool.release(conn)
+
+    print(f"{len(record.queries)} distinct queries, {flagged} flagged")
+    content_app.shutdown()
+    return 1 if flagged else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+from bisect import bisect_left, insort
+
+from reloadable import ReloadableIndex
+
+
+class TopicIndex(ReloadableIndex):
+    """In-memory copy of the topics table for autocomplete and /api/topics.
+
+    Topics are held twice: in id order for listing, and as a sorted array of
+    lower-cased names so prefix lookups are a bisect plus a short slice.
+    Substring matches fall back to a scan of the (small) name array.
+    """
+
+    def __init__(self, max_age=300):
+        super().__init__(max_age)
+        self._by_id = []
+        self._names = {}
+        self._keys = []
+        self._entries = []
+
+    def reload(self, connect):
+        with connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT id, name FROM topics ORDER BY id")
+            rows = [(int(topic_id), name) for topic_id, name in cursor.fetchall()]
+
+        entries = sorted((name.lower(), topic_id, name) for topic_id, name in rows)
+        with self._lock:
+            self._by_id = rows
+            self._names = dict(rows)
+            self._entries = entries
+            self._keys = [key for key, _, _ in entries]
+            self._mark_loaded()
+
+    def add(self, topic_id, name):
+        """Record a topic inserted by this process."""
+        topic_id = int(topic_id)
+        with self._lock:
+            if not self.loaded or topic_id in self._names:
+                return
+            entry = (name.lower(), topic_id, name)
+            position = bisect_left(self._entries, entry)
+            self._entries.insert(position, entry)
+            self._keys.insert(position, entry[0])
+            self._names[topic_id] = name
+            insort(self._by_id, (topic_id, name))
+
+    def name(self, topic_id):
+        with self._lock:
+            return self._names.get(topic_id)
+
+    def all(self):
+        with self._lock:
+            return [{"id": topic_id, "name": name} for topic_id, name in self._by_id]
+
+    def search(self, query, limit=10):
+        """Topics whose name starts with `query`, then those merely containing it."""
+        query = query.lower()
+        if not query:
+            return []
+        with self._lock:
+            results = []
+            start = bisect_left(self._keys, query)
+            for key, topic_id, name in self._entries[start:start + limit]:
+                if not key.startswith(query):
+                    break
+                results.append({"id": topic_id, "name": name})
+            if len(results) < limit:
+                for key, topic_id, name in self._entries:
+                    if query in key and not key.startswith(query):
+                        results.append({"id": topic_id, "name": name})
+                        if len(results) == limit:
+                            break
+            return results
+
+    @property
+    def etag(self):
+        """Validator for the full topic list.
+
+        Topics are only ever inserted, so the count and highest id identify
+        the list's contents and every worker process derives the same tag.
+        """
+        with self._lock:
+            last_id = self._by_id[-1][0] if self._by_id else 0
+            return f"topics-{len(self._by_id)}-{last_id}"
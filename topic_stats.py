@@ -0,0 +1,335 @@
+import json
+from itertools import permutations
+
+from file_handler import METRIC_COLUMNS
+from quantiles import QuantileSketch
+
+# topic_stats row holding the aggregates over every post
+GLOBAL_TOPIC_ID = 0
+
+# Quantiles reported for every metric
+QUANTILES = {"median": 0.5, "p90": 0.9, "p99": 0.99}
+
+# First day of a topic_daily_metrics bucket; weeks start on Monday
+BUCKET_STARTS = {
+    "day": "day",
+    "week": "DATE_SUB(day, INTERVAL WEEKDAY(day) DAY)",
+    "month": "DATE_SUB(day, INTERVAL DAYOFMONTH(day) - 1 DAY)",
+}
+
+
+def new_sketches():
+    return {metric: QuantileSketch() for metric in METRIC_COLUMNS}
+
+
+def load_sketches(text):
+    sketches = new_sketches()
+    if text:
+        for metric, data in json.loads(text).items():
+            if metric in sketches:
+                sketches[metric] = QuantileSketch.from_dict(data)
+    return sketches
+
+
+def dump_sketches(sketches):
+    return json.dumps({metric: sketch.to_dict() for metric, sketch in sketches.items()},
+                      separators=(",", ":"))
+
+
+def add_post_metrics(sketches, post):
+    for metric, sketch in sketches.items():
+        value = post.get(metric)
+        if value is not None:
+            sketch.add(int(value))
+
+
+def remove_post_metrics(sketches, post):
+    for metric, sketch in sketches.items():
+        value = post.get(metric)
+        if value is not None:
+            sketch.remove(int(value))
+
+
+def summarize(sketches):
+    """Count, mean, min/max and approximate quantiles for every metric.
+
+    count and mean are exact. min and max are exact until a refreshed post
+    replaces a value; after that they are only bounds (see
+    QuantileSketch.remove).
+    """
+    summary = {}
+    for metric, sketch in sketches.items():
+        summary[metric] = {
+            "count": sketch.count,
+            "mean": sketch.mean,
+            "min": sketch.min or 0,
+            "max": sketch.max or 0,
+            **{name: round(sketch.quantile(q)) for name, q in QUANTILES.items()},
+        }
+    return summary
+
+
+def record_posts(cursor, posts):
+    """Fold saved posts into the aggregates of their topics.
+
+    `posts` is a list of (post_data, topic_ids, previous). `previous` is
+    None for a newly inserted post; for a refreshed one it is (old_metrics,
+    old_topic_ids), and only the difference is applied: in topics the post
+    was already counted in its old metric values are swapped for the new
+    ones, and it is counted afresh only in topics it was just tagged with.
+    The same differences are added to the post's day in
+    topic_daily_metrics. Runs inside the caller's transaction so the
+    aggregates commit (or roll back) together with the posts. Every
+    affected row, including the global one, is locked and rewritten once
+    per batch.
+    """
+    changes = []
+    for post_data, topic_ids, previous in posts:
+        old_metrics, old_topic_ids = previous or (None, ())
+        old_ids = sorted(set(old_topic_ids))
+        new_ids = sorted(set(topic_ids) - set(old_ids))
+        # An existing post is already counted in the global row, with or
+        # without topics
+        if previous is not None:
+            kept, added = [GLOBAL_TOPIC_ID] + old_ids, new_ids
+        else:
+            kept, added = [], [GLOBAL_TOPIC_ID] + new_ids
+        changes.append((post_data, old_metrics, old_ids, new_ids, kept, added))
+    if not changes:
+        return
+
+    row_ids = sorted({topic_id for *_, kept, added in changes for topic_id in kept + added})
+    # FOR UPDATE locks nothing for a row that doesn't exist yet, so two
+    # transactions creating the same row would both build it from empty and
+    # the second write would drop the first's posts. Create missing rows
+    # first so that every row below is locked before it is read.
+    cursor.executemany(
+        "INSERT IGNORE INTO topic_stats (topic_id, metric_sketches) VALUES (%s, '')",
+        [(topic_id,) for topic_id in row_ids],
+    )
+    cursor.execute(
+        f"SELECT topic_id, metric_sketches FROM topic_stats "
+        f"WHERE topic_id IN ({', '.join(['%s'] * len(row_ids))}) FOR UPDATE",
+        row_ids,
+    )
+    existing = dict(cursor.fetchall())
+
+    # post_count and last_post_datetime hold deltas merged by the upsert below
+    aggregates = {topic_id: (0, None, load_sketches(existing.get(topic_id))) for topic_id in row_ids}
+    pairs = {}
+    # (topic_id, day) -> [post count, metric sums...] deltas
+    daily = {}
+    for post_data, old_metrics, old_ids, new_ids, kept, added in changes:
+        post_datetime = post_data.get("post_datetime")
+        day = str(post_datetime)[:10] if post_datetime else None
+        values = [int(post_data.get(metric) or 0) for metric in METRIC_COLUMNS]
+
+        for topic_id in kept:
+            sketches = aggregates[topic_id][2]
+            remove_post_metrics(sketches, old_metrics)
+            add_post_metrics(sketches, post_data)
+            if day:
+                deltas = [value - int(old_metrics.get(metric) or 0)
+                          for metric, value in zip(METRIC_COLUMNS, values)]
+                _add_daily(daily, topic_id, day, 0, deltas)
+
+        for topic_id in added:
+            count, last_post, sketches = aggregates[topic_id]
+            add_post_metrics(sketches, post_data)
+            if post_datetime and (last_post is None or str(post_datetime) > str(last_post)):
+                last_post = post_datetime
+            aggregates[topic_id] = (count + 1, last_post, sketches)
+            if day:
+                _add_daily(daily, topic_id, day, 1, values)
+
+        # Only pairs involving a new tag are new co-occurrences
+        for pair in permutations(old_ids + new_ids, 2):
+            if pair[0] in new_ids or pair[1] in new_ids:
+                pairs[pair] = pairs.get(pair, 0) + 1
+
+    cursor.executemany(
+        """
+        INSERT INTO topic_stats (topic_id, post_count, last_post_datetime, metric_sketches)
+        VALUES (%s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            post_count = post_count + VALUES(post_count),
+            last_post_datetime = GREATEST(COALESCE(last_post_datetime, VALUES(last_post_datetime)),
+                                          COALESCE(VALUES(last_post_datetime), last_post_datetime)),
+            metric_sketches = VALUES(metric_sketches)
+        """,
+        [
+            (topic_id, count, last_post, dump_sketches(sketches))
+            for topic_id, (count, last_post, sketches) in aggregates.items()
+        ],
+    )
+
+    if pairs:
+        cursor.executemany(
+            """
+            INSERT INTO topic_cooccurrence (topic_id, related_topic_id, post_count)
+            VALUES (%s, %s, %s)
+            ON DUPLICATE KEY UPDATE post_count = post_count + VALUES(post_count)
+            """,
+            [(topic_id, related_id, count) for (topic_id, related_id), count in pairs.items()],
+        )
+
+    rows = [[topic_id, day] + sums for (topic_id, day), sums in sorted(daily.items()) if any(sums)]
+    if rows:
+        cursor.executemany(
+            f"INSERT INTO topic_daily_metrics (topic_id, day, post_count, {', '.join(METRIC_COLUMNS)}) "
+            f"VALUES ({', '.join(['%s'] * (len(METRIC_COLUMNS) + 3))}) "
+            f"ON DUPLICATE KEY UPDATE post_count = post_count + VALUES(post_count), "
+            + ", ".join(f"{metric} = {metric} + VALUES({metric})" for metric in METRIC_COLUMNS),
+            rows,
+        )
+
+
+def _add_daily(daily, topic_id, day, count, values):
+    sums = daily.setdefault((topic_id, day), [0] * (len(METRIC_COLUMNS) + 1))
+    sums[0] += count
+    for index, value in enumerate(values, 1):
+        sums[index] += value
+
+
+def _rebuild_daily(cursor):
+    columns = ", ".join(METRIC_COLUMNS)
+    sums = ", ".join(f"SUM(p.{metric})" for metric in METRIC_COLUMNS)
+    cursor.execute("DELETE FROM topic_daily_metrics")
+    cursor.execute(
+        f"INSERT INTO topic_daily_metrics (topic_id, day, post_count, {columns}) "
+        f"SELECT {GLOBAL_TOPIC_ID}, DATE(p.post_datetime), COUNT(*), {sums} FROM posts p "
+        f"WHERE p.post_datetime IS NOT NULL GROUP BY DATE(p.post_datetime)"
+    )
+    cursor.execute(
+        f"INSERT INTO topic_daily_metrics (topic_id, day, post_count, {columns}) "
+        f"SELECT tp.topic_id, DATE(p.post_datetime), COUNT(*), {sums} "
+        f"FROM topic_posts tp JOIN posts p ON p.post_id = tp.post_id "
+        f"WHERE p.post_datetime IS NOT NULL GROUP BY tp.topic_id, DATE(p.post_datetime)"
+    )
+
+
+def rebuild(conn):
+    """Recompute every aggregate from posts and topic_posts.
+
+    Meant for backfilling and for repairing drift, via
+    `flask --app app refresh-topic-stats`. Rows are streamed into per-topic
+    sketches, so memory grows with the number of topics, not posts.
+    """
+    cursor = conn.cursor()
+    conn.start_transaction()
+    try:
+        columns = ", ".join(f"p.{metric}" for metric in METRIC_COLUMNS)
+        cursor.execute(f"SELECT {GLOBAL_TOPIC_ID}, p.post_datetime, {columns} FROM posts p")
+        aggregates = {}
+        _accumulate(cursor, aggregates)
+        cursor.execute(
+            f"SELECT tp.topic_id, p.post_datetime, {columns} "
+            f"FROM topic_posts tp JOIN posts p ON p.post_id = tp.post_id"
+        )
+        _accumulate(cursor, aggregates)
+
+        cursor.execute("DELETE FROM topic_stats")
+        if aggregates:
+            cursor.executemany(
+                """
+                INSERT INTO topic_stats (topic_id, post_count, last_post_datetime, metric_sketches)
+                VALUES (%s, %s, %s, %s)
+                """,
+                [
+                    (topic_id, count, last_post, dump_sketches(sketches))
+                    for topic_id, (count, last_post, sketches) in aggregates.items()
+                ],
+            )
+
+        cursor.execute("DELETE FROM topic_cooccurrence")
+        cursor.execute(
+            """
+            INSERT INTO topic_cooccurrence (topic_id, related_topic_id, post_count)
+            SELECT a.topic_id, b.topic_id, COUNT(*)
+            FROM topic_posts a
+            JOIN topic_posts b ON a.post_id = b.post_id AND a.topic_id != b.topic_id
+            GROUP BY a.topic_id, b.topic_id
+            """
+        )
+        _rebuild_daily(cursor)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return len(aggregates) - (GLOBAL_TOPIC_ID in aggregates)
+
+
+def _accumulate(cursor, aggregates):
+    for row in cursor:
+        topic_id, post_datetime = row[0], row[1]
+        count, last_post, sketches = aggregates.get(topic_id) or (0, None, new_sketches())
+        add_post_metrics(sketches, dict(zip(METRIC_COLUMNS, row[2:])))
+        if post_datetime is not None and (last_post is None or post_datetime > last_post):
+            last_post = post_datetime
+        aggregates[topic_id] = (count + 1, last_post, sketches)
+
+
+def fetch_topic_summary(cursor, topic_id):
+    """(post_count, last_post_datetime, per-metric summary) for a topic, or None."""
+    cursor.execute(
+        "SELECT post_count, last_post_datetime, metric_sketches FROM topic_stats WHERE topic_id = %s",
+        (topic_id,),
+    )
+    row = cursor.fetchone()
+    if not row:
+        return None
+    if isinstance(row, dict):
+        row = (row["post_count"], row["last_post_datetime"], row["metric_sketches"])
+    post_count, last_post_datetime, text = row
+    return post_count, last_post_datetime, summarize(load_sketches(text))
+
+
+def fetch_topic_stats(cursor, topic_id):
+    """Stats for the topic page in the shape the template expects."""
+    result = fetch_topic_summary(cursor, topic_id)
+    if not result:
+        return 0, None, {f"{kind}_{metric}": 0 for metric in ("likes", "impressions", "comments")
+                         for kind in ("avg", "median")}
+
+    post_count, last_post_datetime, summary = result
+    stats = {}
+    for metric in ("likes", "impressions", "comments"):
+        stats[f"avg_{metric}"] = summary[metric]["mean"]
+        stats[f"median_{metric}"] = summary[metric]["median"]
+    return post_count, last_post_datetime, stats
+
+
+def fetch_metric_buckets(cursor, topic_id, bucket, metrics, date_from=None, date_to=None):
+    """[(bucket start date, post count, {metric: sum})] for a topic, oldest first.
+
+    Posts count in the bucket of the day they were published; `bucket` is a
+    key of BUCKET_STARTS and the dates bound the days included.
+    """
+    query = (f"SELECT {BUCKET_STARTS[bucket]} AS bucket_start, SUM(post_count), "
+             f"{', '.join(f'SUM({metric})' for metric in metrics)} "
+             f"FROM topic_daily_metrics WHERE topic_id = %s")
+    params = [topic_id]
+    if date_from:
+        query += " AND day >= %s"
+        params.append(date_from)
+    if date_to:
+        query += " AND day <= %s"
+        params.append(date_to)
+    cursor.execute(query + " GROUP BY bucket_start ORDER BY bucket_start", params)
+    return [(row[0], int(row[1]), {metric: int(value) for metric, value in zip(metrics, row[2:])})
+            for row in cursor.fetchall()]
+
+
+def fetch_related_topics(cursor, topic_id, limit=10):
+    cursor.execute(
+        """
+        SELECT t.id, t.name, c.post_count
+        FROM topic_cooccurrence c
+        JOIN topics t ON t.id = c.related_topic_id
+        WHERE c.topic_id = %s
+        ORDER BY c.post_count DESC
+        LIMIT %s
+        """,
+        (topic_id, limit),
+    )
+    return cursor.fetchall()